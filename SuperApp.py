@@ -1,33 +1,58 @@
 import os
 import re
+import logging
 import json
 import pytz
 import time
 import requests
-from typing import List, Tuple
+from urllib.parse import urlparse
+from typing import Dict, Iterable, List, Mapping, Optional
 from datetime import datetime, timedelta
 from playwright.sync_api import Playwright, sync_playwright, expect, TimeoutError
+from config import AccountCredentials, parse_space_accounts
+from rate_limiter import get_rate_limiter
+from health_check import LEAFLOW_HOSTS, WEIRDHOST_HOSTS, get_health_checker, format_host_failures
+from perf_metrics import PerfCollector
+from proxy_pool import get_proxy_pool
+from credential_quarantine import get_quarantine
+from asset_cache import get_asset_cache
+from weirdhost_http import KST, REMEMBER_COOKIE_NAME, WeirdhostHttpClient
+from session_validator import get_session_validator
+from account_lease import LEASE_ACQUIRED, LEASE_DONE, get_account_leases, leaflow_lease_key
+from browser_farm import get_playwright_farm
+
+# 站点地址，可指向本地替身站点做测试
+LEAFLOW_HOME_URL = os.environ.get('LEAFLOW_HOME_URL', 'https://leaflow.net/')
+WEIRDHOST_BASE_URL = os.environ.get('WEIRDHOST_BASE_URL', 'https://hub.weirdhost.xyz').rstrip('/')
 
-# 定义账户凭证类型
-AccountCredentials = List[Tuple[str, str]]
 def parse_accounts(accounts_str: str) -> AccountCredentials:
     # 从账户字符串中解析账户凭证。 "邮箱1,密码1 邮箱2,密码2"
-    accounts: AccountCredentials = []
-
-    # 账户之间用空格分隔
-    account_pairs = [pair.strip() for pair in accounts_str.split(' ') if pair.strip()]
-
-    for pair in account_pairs:
-        # 邮箱和密码之间用逗号分隔
-        parts = [part.strip() for part in pair.split(',') if part.strip()]
-
-        if len(parts) == 2:
-            accounts.append((parts[0], parts[1]))
-        else:
-            print(f"⚠️ 警告：跳过格式错误的账户对 '{pair}'。请使用 '邮箱,密码' 格式。")
+    accounts, errors = parse_space_accounts(accounts_str)
+    for error in errors:
+        print(f"⚠️ 警告：跳过格式错误的账户。{error}")
     return accounts
 
-def run(playwright: Playwright) -> None:
+def run(
+    playwright: Playwright,
+    browser=None,
+    env: Optional[Mapping[str, str]] = None,
+    tasks: Iterable[str] = ('leaflow', 'weirdhost'),
+) -> Dict[str, object]:
+    # browser: 传入已启动的浏览器时复用它且不关闭（服务模式的常驻 worker）
+    # env: 配置来源，默认读取环境变量；服务模式下传入每个任务自己的配置
+    # tasks: 要执行的任务，命令行入口的 weirdhost 子命令只执行 Weirdhost 续期
+    # 返回 {'notifications': 本次运行产生的全部通知消息, 'outcomes': {任务: 是否全部成功}}
+    # outcomes 只包含实际尝试过的任务（由其他进程处理的账户不计入）
+    if env is None:
+        env = os.environ
+    owns_browser = browser is None
+    notifications: List[str] = []
+    outcomes: Dict[str, bool] = {}
+
+    # 记录任务结果：同一任务中任何一项失败即为失败
+    def record_outcome(task, ok):
+        outcomes[task] = outcomes.get(task, True) and ok
+
     # --- 环境变量配置 ---
     # ---------------------------------------------------------------------------------
     # 用户可编辑区域：在这里直接填写您的 Leaflow 多账户 (格式: "邮箱1,密码1 邮箱2,密码2")
@@ -37,26 +62,38 @@ def run(playwright: Playwright) -> None:
     DEFAULT_LEAFLOW_ACCOUNTS_STR = ""
 
     # 获取账户源字符串：优先从环境变量 'LEAFLOW_ACCOUNTS' 获取，否则使用默认字符串。
-    accounts_source_str = os.environ.get('LEAFLOW_ACCOUNTS', DEFAULT_LEAFLOW_ACCOUNTS_STR)
+    accounts_source_str = env.get('LEAFLOW_ACCOUNTS', DEFAULT_LEAFLOW_ACCOUNTS_STR)
     # Leaflow 多账户配置
-    LEAFLOW_ACCOUNTS = parse_accounts(accounts_source_str)
+    LEAFLOW_ACCOUNTS = parse_accounts(accounts_source_str) if 'leaflow' in tasks else []
 
     # Weirdhost 单账户配置
-    WEIRDHOST_EMAIL = os.environ.get('WEIRDHOST_EMAIL', '')
-    WEIRDHOST_PASSWORD = os.environ.get('WEIRDHOST_PASSWORD', '')
-    WEIRDHOST_LOGIN_URL = os.environ.get('WEIRDHOST_LOGIN_URL', '')
-    WEIRDHOST_COOKIE_FILE = os.environ.get('WEIRDHOST_COOKIE_FILE', '')
-    remember_web_cookie = os.environ.get('REMEMBER_WEB_COOKIE', '')
+    WEIRDHOST_EMAIL = env.get('WEIRDHOST_EMAIL', '')
+    WEIRDHOST_PASSWORD = env.get('WEIRDHOST_PASSWORD', '')
+    WEIRDHOST_LOGIN_URL = env.get('WEIRDHOST_LOGIN_URL', '')
+    WEIRDHOST_COOKIE_FILE = env.get('WEIRDHOST_COOKIE_FILE', '')
+    remember_web_cookie = env.get('REMEMBER_WEB_COOKIE', '')
+    # 续期后等待到期时间更新的上限（秒）
+    WEIRDHOST_RENEW_TIMEOUT = int(env.get('WEIRDHOST_RENEW_TIMEOUT', '30'))
 
     # Telegram Bot 通知配置（可选）
-    TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
-    TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID', '')
-
-    # 启用无头模式
-    browser = playwright.chromium.launch(headless=True)
+    TELEGRAM_BOT_TOKEN = env.get('TELEGRAM_BOT_TOKEN', '')
+    TELEGRAM_CHAT_ID = env.get('TELEGRAM_CHAT_ID', '')
+
+    # 按主机共享的限速器，替代固定的账户间/任务间等待
+    rate_limiter = get_rate_limiter()
+    # 页面性能采集（PERF_METRICS=1 时开启）；每次运行单独采集，任务服务中并发的运行互不混入
+    perf_collector = PerfCollector()
+    # 出口代理池（配置 PROXY_POOL 时每个账户固定一个代理）
+    proxy_pool = get_proxy_pool()
+    # 跨上下文共享的静态资源缓存
+    asset_cache = get_asset_cache()
+    # 远程浏览器节点（配置 PLAYWRIGHT_REMOTE_NODES 时不在本机启动浏览器）
+    playwright_farm = get_playwright_farm()
+    remote_node = None
 
     # 推送telegram消息
     def send_telegram_message(message):
+        notifications.append(message)
         if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
             print("Telegram bot token or chat ID not configured. Skipping Telegram notification.")
             return False
@@ -69,6 +106,7 @@ def run(playwright: Playwright) -> None:
         }
 
         try:
+            rate_limiter.acquire(url)
             response = requests.post(url, json=payload)
             response.raise_for_status()
             print("Telegram notification sent successfully.")
@@ -117,21 +155,27 @@ def run(playwright: Playwright) -> None:
         # 登录成功标志 - 至少提供一个
         SUCCESS_SELECTOR: str = None,           # CSS 或 XPath 字符串 (例如 "a[href*='logout']")
         SUCCESS_ROLE_NAME: str = None,          # Playwright 角色名 (例如 "登出")
-        LOGIN_URL_PATTERN: str = None           # 辅助判断：登录页 URL 包含的模式 (例如 "login.php")
+        LOGIN_URL_PATTERN: str = None,          # 辅助判断：登录页 URL 包含的模式 (例如 "login.php")
+        proxies: dict = None                    # 会话预校验使用的 requests 代理
     ) -> bool:
         if not cookies_to_add or (SUCCESS_SELECTOR is None and SUCCESS_ROLE_NAME is None):
             print("⚠️ 未提供 cookies 或成功判断标志。")
             return False
 
+        # 0. 先用一次 HTTP 请求校验会话：明确失效时不再打开页面
+        verdict = get_session_validator().validate(VERIFY_URL, cookies_to_add, LOGIN_URL_PATTERN or 'login', proxies)
+        if verdict is False:
+            print("❌ Cookie 登录失败，HTTP 校验被重定向回登录页，跳过浏览器验证。")
+            return False
+
         try:
             if cookies_to_add:
               # 1. 设置 Cookie
               context.add_cookies(cookies_to_add)
               print("🍪 Cookies 已添加到浏览器上下文。")
 
-            # 2. 访问验证页面
-            # page.goto(VERIFY_URL, wait_until='domcontentloaded')
-            page.goto(VERIFY_URL, wait_until='networkidle')
+            # 2. 访问验证页面：HTTP 校验已确认有效时只等 DOM 就绪，无法判断时仍等网络空闲
+            page.goto(VERIFY_URL, wait_until='domcontentloaded' if verdict else 'networkidle')
             print(f"尝试访问验证 URL: {VERIFY_URL}")
 
             # 3. 确定用于判断成功的 Locator
@@ -144,7 +188,12 @@ def run(playwright: Playwright) -> None:
                 locator_success = page.locator(SUCCESS_SELECTOR)
 
             # 4. 精确判断：检查登录成功的标志元素
-            # 使用 is_visible() 只检查第一个匹配项是否可见
+            # 使用 is_visible() 只检查第一个匹配项是否可见；只等了 DOM 就绪时先等标志出现
+            if locator_success and verdict:
+                try:
+                    locator_success.first.wait_for(state='visible', timeout=15000)
+                except TimeoutError:
+                    pass
             if locator_success and locator_success.first.is_visible():
                 print(f"✅ Cookie 登录成功! 找到了登际成功标志。")
                 return True
@@ -161,24 +210,190 @@ def run(playwright: Playwright) -> None:
             print(f"⚠️ Cookie 登录尝试时发生错误：{e}")
             return False
 
+    # 续期结果校验：新的到期时间必须晚于续期前，返回通知内容
+    def describe_renewal(old_expiration_dt, new_expiration_dt, elapsed) -> str:
+        old_str = old_expiration_dt.strftime('%Y-%m-%d %H:%M')
+        if new_expiration_dt is None:
+            record_outcome('weirdhost', False)
+            print(f"❌ 等待 {elapsed:.1f} 秒后过期时间仍为 {old_str}，继期可能未生效")
+            return f"❌续期状态: 等待 {elapsed:.0f} 秒后服务器过期时间仍未变化 ({old_str})\n"
+        new_str = new_expiration_dt.strftime('%Y-%m-%d %H:%M')
+        if new_expiration_dt <= old_expiration_dt:
+            record_outcome('weirdhost', False)
+            print(f"❌ 继期后过期时间 {new_str} 未晚于继期前的 {old_str}")
+            return f"❌续期状态: 服务器过期时间未延后 ({old_str} → {new_str})\n"
+        record_outcome('weirdhost', True)
+        print(f"✅ 过期时间已从 {old_str} 延长到 {new_str}，生效耗时 {elapsed:.2f} 秒")
+        content = f"🚀续期状态: 成功\n"
+        content += f"⏰服务器下次过期时间: {new_str}\n"
+        content += f"⏱️继期生效耗时: {elapsed:.1f} 秒\n"
+        return content
+
+    # Weirdhost 无浏览器续期：用已有 cookie 直接调用面板接口，成功时返回 True
+    def renew_weirdhost_over_http() -> bool:
+        cookies = load_cookies_from_file(WEIRDHOST_COOKIE_FILE) if os.path.exists(WEIRDHOST_COOKIE_FILE) else None
+        if not WEIRDHOST_LOGIN_URL or not (cookies or remember_web_cookie):
+            return False
+
+        print("\n--- 尝试通过 HTTP 执行 weirdhost 继期任务...")
+        started_at = time.monotonic()
+        try:
+            client = WeirdhostHttpClient(WEIRDHOST_LOGIN_URL, remember_web_cookie, cookies)
+            weirdhost_proxy = proxy_pool.assign(f"weirdhost:{WEIRDHOST_EMAIL}")
+            if weirdhost_proxy:
+                client.session.proxies.update(weirdhost_proxy.requests_proxies())
+            rate_limiter.acquire(WEIRDHOST_LOGIN_URL)
+            expiration_dt = client.get_expiration(client.open_session())
+        except Exception as e:
+            print(f"⚠️ HTTP 读取过期时间失败，回退到浏览器流程：{e}")
+            return False
+
+        now_kst = datetime.now(KST)
+        print(f"找到到期时间: {expiration_dt.strftime('%Y-%m-%d %H:%M')}，Now KST time: {now_kst.strftime('%Y-%m-%d %H:%M')}")
+        content = f"🆔WEIRDHOST帐号: {WEIRDHOST_EMAIL}\n"
+        if expiration_dt > now_kst + timedelta(days=1):
+            print("✅ 未到24小时继期窗口，不执行操作")
+            record_outcome('weirdhost', True)
+            content += f"⏰服务器过期时间：{expiration_dt.strftime('%Y-%m-%d %H:%M')}\n"
+            content += f"🚀续期状态: 未到24小时继期窗口，不执行操作\n"
+        else:
+            renew_started_at = time.monotonic()
+            try:
+                client.renew()
+            except Exception as e:
+                print(f"⚠️ HTTP 续期请求失败，回退到浏览器流程：{e}")
+                return False
+            print("✅ 已经进入24小时继期窗口，HTTP 继期请求已发送，等待过期时间更新...")
+            CST = pytz.timezone('Asia/Shanghai')
+            content += f"⏰运行继期脚本时间: {datetime.now(CST).strftime('%Y-%m-%d %H:%M')}\n"
+            next_expiration_dt = client.wait_for_expiration_change(expiration_dt, WEIRDHOST_RENEW_TIMEOUT)
+            if next_expiration_dt is None:
+                # 接口返回成功但过期时间没有变化（例如 WEIRDHOST_RENEW_PATH 配置错误）：回退到浏览器流程，
+                # 浏览器流程会重新读取过期时间，只在仍处于 24 小时窗口内时才点击续期，不会重复续期
+                print(f"⚠️ HTTP 续期后 {WEIRDHOST_RENEW_TIMEOUT} 秒内过期时间未变化，回退到浏览器流程")
+                return False
+            content += describe_renewal(expiration_dt, next_expiration_dt, time.monotonic() - renew_started_at)
+
+        print(f"✅ Weirdhost HTTP 流程完成，耗时 {time.monotonic() - started_at:.2f} 秒")
+        send_telegram_message(f"**Weirdhost继期信息**\n{content}")
+        return True
+
+    # --- 预检：启动浏览器前探测目标站点，站点不可用的任务整体跳过 ---
+    health_checker = get_health_checker()
+    weirdhost_configured = 'weirdhost' in tasks and bool(
+        WEIRDHOST_EMAIL or remember_web_cookie or os.path.exists(WEIRDHOST_COOKIE_FILE)
+    )
+    leaflow_failures = health_checker.unhealthy_hosts(LEAFLOW_HOSTS) if LEAFLOW_ACCOUNTS else []
+    weirdhost_failures = health_checker.unhealthy_hosts(WEIRDHOST_HOSTS) if weirdhost_configured else []
+    leaflow_ready = bool(LEAFLOW_ACCOUNTS) and not leaflow_failures
+    weirdhost_ready = weirdhost_configured and not weirdhost_failures
+
+    if leaflow_failures:
+        record_outcome('leaflow', False)
+    if weirdhost_failures:
+        record_outcome('weirdhost', False)
+    if leaflow_failures or weirdhost_failures:
+        # 每个异常主机只通知一行，而不是每个账户各报一次失败
+        host_failures = leaflow_failures + weirdhost_failures
+        print(f"❌ 站点预检失败：\n{format_host_failures(host_failures)}")
+        send_telegram_message(f"**站点预检失败，已跳过相关任务**\n{format_host_failures(host_failures)}")
+
+    # 优先走 HTTP 续期，成功时 Weirdhost 不再需要浏览器
+    weirdhost_done_over_http = False
+    if weirdhost_ready and env.get('WEIRDHOST_HTTP_RENEWAL', '1') != '0':
+        weirdhost_done_over_http = renew_weirdhost_over_http()
+        weirdhost_ready = not weirdhost_done_over_http
+
+    # 连接远程节点；节点断开时释放它，换一个节点重新连接后继续处理后面的账户
+    # 没有可用节点时抛出 RuntimeError，由调用处按单个账户/任务失败处理
+    def reconnect_if_needed():
+        nonlocal browser, remote_node
+        if not owns_browser or not playwright_farm.enabled:
+            return
+        if browser is not None and browser.is_connected():
+            return
+        if remote_node is not None:
+            print(f"⚠️ 远程浏览器节点 {remote_node.url} 已断开，切换到其他节点")
+            playwright_farm.release(remote_node, success=False)
+            remote_node = None
+        remote_node, browser = playwright_farm.open(lambda node: playwright.chromium.connect(node.url))
+        print(f"🌐 使用远程浏览器节点 {remote_node.url}")
+
+    # 失败截图：页面未创建或浏览器已断开时跳过
+    def take_screenshot(page, path):
+        if page is None:
+            return
+        try:
+            page.screenshot(path=path)
+        except Exception as e:
+            print(f"⚠️ 截图失败：{e}")
+
+    # 关闭页面和上下文：远程浏览器已断开时忽略错误
+    def close_context(context, page):
+        for target in (page, context):
+            if target is None:
+                continue
+            try:
+                target.close()
+            except Exception as e:
+                print(f"⚠️ 关闭浏览器上下文失败：{e}")
+
+    # 启用无头模式（所有任务都被跳过时不启动浏览器）
+    if owns_browser and (leaflow_ready or weirdhost_ready):
+        if playwright_farm.enabled:
+            try:
+                reconnect_if_needed()
+            except RuntimeError as e:
+                # 之后每个账户/任务会再次尝试连接，失败时分别记为失败
+                print(f"❌ 远程浏览器节点不可用：{e}")
+        else:
+            browser = playwright.chromium.launch(headless=True)
+
     # --- LEAFLOW 多账户执行步骤 ---
-    if LEAFLOW_ACCOUNTS:
+    if leaflow_ready:
         print(f"\n--- 开始执行 Leaflow 多账户签到任务 ({len(LEAFLOW_ACCOUNTS)} 个账户) ---")
 
+        quarantine = get_quarantine()
+        leases = get_account_leases()
         for index, (email, password) in enumerate(LEAFLOW_ACCOUNTS):
-            # 为每个账户创建新的、隔离的浏览器上下文和页面
-            context = browser.new_context()
-            page = context.new_page()
+            # 凭证已被站点拒绝且未修改的账户直接跳过（隔离记录与 leaflow_checkin.py 共享）
+            quarantine_reason = quarantine.is_quarantined(email, password)
+            if quarantine_reason:
+                print(f"🔒 [Leaflow] 账号 #{index + 1} 凭证错误已隔离，跳过: {quarantine_reason}")
+                record_outcome('leaflow', False)
+                continue
+
+            proxy = proxy_pool.assign(email)
+            context = page = None
             email_id = email.split('@')[0]
-            print(f"\n[Leaflow - {email_id}] 账号 #{index + 1} ({email}) 开始执行...")
-
+            account_ok = False
+            checkin_done = False
+
+            # 与 leaflow_checkin.py 共享跨进程租约：其他进程正在处理或今天已签到的账户直接跳过
+            # 取得租约后立即进入 try，之后的任何异常都会在 finally 中释放租约
+            lease_key = leaflow_lease_key(email)
+            lease_state = leases.acquire(lease_key)
+            if lease_state != LEASE_ACQUIRED:
+                reason = "今日已签到" if lease_state == LEASE_DONE else "正在签到中"
+                print(f"⏭️ [Leaflow] 账号 #{index + 1} 已由其他进程处理（{reason}），跳过")
+                continue
+            account_started_at = time.monotonic()
             try:
-                print(f"[{email_id}] 🚀 导航至 leaflow.net...")
+                print(f"\n[Leaflow - {email_id}] 账号 #{index + 1} ({email}) 开始执行...")
+                # 为每个账户创建新的、隔离的浏览器上下文和页面，并固定出口代理
+                reconnect_if_needed()
+                context = browser.new_context(proxy=proxy.playwright_config()) if proxy else browser.new_context()
+                asset_cache.attach(context)
+                page = context.new_page()
+
+                rate_limiter.acquire(LEAFLOW_HOME_URL)
+                print(f"[{email_id}] 🚀 导航至 {LEAFLOW_HOME_URL}...")
                 page.goto(
-                    "https://leaflow.net/",
+                    LEAFLOW_HOME_URL,
                     timeout=60000,
                     wait_until="domcontentloaded"
                 )
+                perf_collector.record_playwright(page, "leaflow_home")
 
                 page.get_by_role("button", name="登录", exact=True).click()
                 page.get_by_role("textbox", name="邮箱或手机号").fill(email)
@@ -188,20 +403,36 @@ def run(playwright: Playwright) -> None:
 
                 page.wait_for_selector('text="工作区"', timeout=20000)
                 print(f"[{email_id}] 已完成登录尝试。")
+                account_ok = True
 
                 page.get_by_role("link", name="工作区").click()
                 page.get_by_text("签到试用").click()
                 print(f"[{email_id}] 已进入签到页面...")
+                if perf_collector.enabled:
+                    # 性能采集失败不能影响签到结果；取不到 iframe 时跳过，避免把主页面数据记在 iframe 名下
+                    try:
+                        workspace_frame = page.locator("#app iframe").element_handle(timeout=20000).content_frame()
+                    except Exception as e:
+                        print(f"⚠️ [{email_id}] 性能采集未找到签到 iframe：{e}")
+                        workspace_frame = None
+                    if workspace_frame is not None:
+                        perf_collector.record_playwright(page, "leaflow_workspace_iframe", frame=workspace_frame)
 
+                checkin_frame = page.locator("#app iframe").content_frame
                 try:
-                    page.locator("#app iframe").content_frame.get_by_role("button", name=" 立即签到").click()
+                    checkin_frame.get_by_role("button", name=" 立即签到").click()
                     print(f"✅ 任务执行成功: [{email_id}] 签到操作已完成。")
+                    checkin_done = True
                     content = f"🆔LEAFLOW帐号: {email_id}\n"
                     content += f"🚀签到状态: 签到操作已完成\n"
                     telegram_message = f"**LEAFLOW签到信息**\n{content}"
                     send_telegram_message(telegram_message)
                 except Exception as e:
+                    # 点击失败时只有页面显示「已签到」才算今天已完成，其余情况按任务失败处理
+                    if not checkin_frame.get_by_text("已签到").first.is_visible():
+                        raise
                     print(f"✅ [{email_id}] 今日已经签到！")
+                    checkin_done = True
                     content = f"🆔LEAFLOW帐号: {email_id}\n"
                     content += f"🚀签到状态: 今日已经签到！\n"
                     telegram_message = f"**LEAFLOW签到信息**\n{content}"
@@ -209,37 +440,46 @@ def run(playwright: Playwright) -> None:
 
             except TimeoutError as te:
                 print(f"❌ 任务执行失败：Playwright (操作超时：{te})")
-                page.screenshot(path="leaflow_error_screenshot.png")
+                take_screenshot(page, "leaflow_error_screenshot.png")
                 content = f"🆔LEAFLOW帐号: {email_id}\n"
                 content += f"🚀签到状态: 任务执行失败：Playwright 操作超时\n"
                 telegram_message = f"**LEAFLOW签到信息**\n{content}"
                 send_telegram_message(telegram_message)
             except Exception as e:
                 print("❌ 任务执行失败：详细错误信息: {e}")
-                page.screenshot(path="leaflow_final_error_screenshot.png") # 失败时强制截图
+                take_screenshot(page, "leaflow_final_error_screenshot.png") # 失败时强制截图
                 content = f"🆔LEAFLOW帐号: {email_id}\n"
                 content += f"🚀签到状态: 任务执行失败 (未知错误: {e})\n"
                 telegram_message = f"**LEAFLOW签到信息**\n{content}"
                 send_telegram_message(telegram_message)
             finally:
                 # 隔离清理：关闭当前账户的页面和上下文
-                page.close()
-                context.close()
-                time.sleep(10) # 账户间延迟，确保资源释放
-
-        time.sleep(30) # 两个主要任务之间的延迟
-    else:
+                close_context(context, page)
+                proxy_pool.report_result(proxy, account_ok, time.monotonic() - account_started_at)
+                leases.release(lease_key, done=checkin_done)
+                record_outcome('leaflow', checkin_done)
+
+        for line in proxy_pool.report():
+            print(f"📡 代理统计 {line}")
+    elif LEAFLOW_ACCOUNTS:
+         print("\n--- ℹ️ 跳过 Leaflow 任务：目标站点预检失败。 ---")
+    elif 'leaflow' in tasks:
          print("\n--- ℹ️ 跳过 Leaflow 任务：未配置 LEAFLOW_ACCOUNTS。 ---")
-         time.sleep(5) # 保持延迟
 
     # --- WEIRDHOST 单账户执行步骤 (保持原样，并增加隔离) ---
     weirdhost_is_logged_in = False
-    if WEIRDHOST_EMAIL or remember_web_cookie or os.path.exists(WEIRDHOST_COOKIE_FILE):
+    if weirdhost_ready:
         print(f"\n--- 开始执行weirdhost继期任务...")
-        context = browser.new_context() # 新的上下文
-        page = context.new_page()       # 新的页面
+        rate_limiter.acquire(WEIRDHOST_BASE_URL)
+        weirdhost_proxy = proxy_pool.assign(f"weirdhost:{WEIRDHOST_EMAIL}")
+        context = page = None
 
         try:
+            reconnect_if_needed()
+            context = browser.new_context(proxy=weirdhost_proxy.playwright_config()) if weirdhost_proxy else browser.new_context() # 新的上下文
+            asset_cache.attach(context)
+            page = context.new_page()       # 新的页面
+
             # --- 方案一：优先尝试使用 Cookie 会话登录 ---
             if os.path.exists(WEIRDHOST_COOKIE_FILE):
               loaded_cookies = load_cookies_from_file(WEIRDHOST_COOKIE_FILE)
@@ -249,7 +489,8 @@ def run(playwright: Playwright) -> None:
                       page,
                       loaded_cookies,
                       WEIRDHOST_LOGIN_URL,
-                      SUCCESS_ROLE_NAME="콘솔"
+                      SUCCESS_ROLE_NAME="콘솔",
+                      proxies=weirdhost_proxy.requests_proxies() if weirdhost_proxy else None
                   )
 
             if not weirdhost_is_logged_in and remember_web_cookie:
@@ -258,9 +499,9 @@ def run(playwright: Playwright) -> None:
 
                 session_cookie = [
                     {
-                        'name': 'remember_web_59ba36addc2b2f9401580f014c7f58ea4e30989d',
+                        'name': REMEMBER_COOKIE_NAME,
                         'value': remember_web_cookie,
-                        'domain': 'hub.weirdhost.xyz',
+                        'domain': urlparse(WEIRDHOST_BASE_URL).hostname,
                         'path': '/',
                         'expires': int(time.time()) + 3600 * 24 * 365,
                         'httpOnly': True,
@@ -273,16 +514,17 @@ def run(playwright: Playwright) -> None:
                     page,
                     session_cookie,
                     WEIRDHOST_LOGIN_URL,
-                    SUCCESS_ROLE_NAME="콘솔"
+                    SUCCESS_ROLE_NAME="콘솔",
+                    proxies=weirdhost_proxy.requests_proxies() if weirdhost_proxy else None
                 )
                 # if weirdhost_is_logged_in: save_cookies(context, WEIRDHOST_COOKIE_FILE)
 
             # --- 方案二：如果 Cookie 方案失败或未提供，则使用邮箱密码登录 ---
             if not weirdhost_is_logged_in and WEIRDHOST_EMAIL and WEIRDHOST_PASSWORD:
                 print("❌ Cookie 无效或不存在，使用 EMAIL/PASSWORD 开始执行登录任务...")
-                print(f"🚀 导航至 https://hub.weirdhost.xyz/auth/login ...")
+                print(f"🚀 导航至 {WEIRDHOST_BASE_URL}/auth/login ...")
                 page.goto(
-                    "https://hub.weirdhost.xyz/auth/login",
+                    f"{WEIRDHOST_BASE_URL}/auth/login",
                     timeout=60000,
                     wait_until="domcontentloaded"
                 )
@@ -295,10 +537,11 @@ def run(playwright: Playwright) -> None:
                     pass
 
                 page.get_by_role("button", name="로그인", exact=True).click()
-                page.wait_for_url("https://hub.weirdhost.xyz/")
+                page.wait_for_url(f"{WEIRDHOST_BASE_URL}/")
                 print("用户名密码登录成功。")
                 weirdhost_is_logged_in = True
-                save_cookies(context)
+                if WEIRDHOST_COOKIE_FILE:
+                    save_cookies(context, WEIRDHOST_COOKIE_FILE)
 
                 page.get_by_role("link", name="Discord's Bot Server").click()
                 page.wait_for_url(WEIRDHOST_LOGIN_URL, timeout=15000)
@@ -307,7 +550,7 @@ def run(playwright: Playwright) -> None:
             # --- 继期操作 ---
             content = f"🆔WEIRDHOST帐号: {WEIRDHOST_EMAIL}\n"
             if weirdhost_is_logged_in:
-                KST = pytz.timezone('Asia/Seoul')
+                perf_collector.record_playwright(page, "weirdhost_server")
                 # 从页面查找过期日期
                 def get_expiration_date():
                     try:
@@ -329,6 +572,24 @@ def run(playwright: Playwright) -> None:
                         print(f"查找过期时间时发生错误: {e}")
                         return None
 
+                # 等待页面上的 유통기한 变为与续期前不同的值，超过上限仍未变化时返回 None
+                def wait_for_expiration_change(old_expiration_dt):
+                    try:
+                        handle = page.wait_for_function(
+                            """old => {
+                                const match = document.body.innerText.match(/유통기한\\s(\\d{4}-\\d{2}-\\d{2}\\s\\d{2}:\\d{2})/);
+                                return match && match[1] !== old ? match[1] : null;
+                            }""",
+                            arg=old_expiration_dt.strftime("%Y-%m-%d %H:%M"),
+                            polling=250,
+                            timeout=WEIRDHOST_RENEW_TIMEOUT * 1000
+                        )
+                    except TimeoutError:
+                        return None
+                    expiration_str = handle.json_value()
+                    print(f"找到更新后的到期日期字符串: {expiration_str}")
+                    return KST.localize(datetime.strptime(expiration_str, "%Y-%m-%d %H:%M"))
+
                 # 1. 获取过期时间
                 expiration_dt = get_expiration_date()
                 # 2. 获取当前时间
@@ -340,55 +601,73 @@ def run(playwright: Playwright) -> None:
                     # 4. 逻辑判断
                     if expiration_dt > now_kst + buffer_time:
                         print("✅ 未到24小时继期窗口，不执行操作")
+                        record_outcome('weirdhost', True)
                         content += f"⏰服务器过期时间：{expiration_dt.strftime('%Y-%m-%d %H:%M')}\n"
                         content += f"🚀续期状态: 未到24小时继期窗口，不执行操作\n"
                     else:
                         # 执行继期操作
                         try:
+                            renew_started_at = time.monotonic()
                             page.get_by_role("button", name="시간추가").click()
-                            print("✅ 已经进入24小时继期窗口，成功完成继期。")
+                            print("✅ 已经进入24小时继期窗口，已点击 '시간추가'，等待过期时间更新...")
 
-                            print("⏳ 等待 10 秒，以确保服务器过期时间数据已更新...")
-                            time.sleep(10)
+                            # 到期时间一变化就继续，最多等待 WEIRDHOST_RENEW_TIMEOUT 秒
+                            next_expiration_dt = wait_for_expiration_change(expiration_dt)
+                            elapsed = time.monotonic() - renew_started_at
 
                             CST = pytz.timezone('Asia/Shanghai')
                             current_time = datetime.now(CST).strftime("%Y-%m-%d %H:%M")
-                            next_expiration_dt = get_expiration_date()
-
                             content += f"⏰运行继期脚本时间: {current_time}\n"
-                            content += f"🚀续期状态: 成功\n"
-                            content += f"⏰服务器下次过期时间: {next_expiration_dt.strftime('%Y-%m-%d %H:%M')}\n"
+                            content += describe_renewal(expiration_dt, next_expiration_dt, elapsed)
                         except Exception as e:
                             print(f"❌ 继期操作失败：点击 '시간추가' 按钮时发生错误: {e}")
+                            record_outcome('weirdhost', False)
                             content += f"❌续期状态: 继期操作失败：点击 '시간추가' 按钮时发生错误\n"
                 else:
                     print("❌ 未能在页面上找到有效的过期时间，无法执行续期判断。")
+                    record_outcome('weirdhost', False)
                     content += f"❌续期状态: 未能在页面上找到有效的过期时间，无法执行续期判断\n"
             else:
                 print("❌ 无法登录（Cookie 已失效或EMAIL/PASSWORD登陆失败），任务终止。")
+                record_outcome('weirdhost', False)
                 content += f"❌续期状态: 无法登录（Cookie已失效或EMAIL/PASSWORD登陆失败）\n"
             telegram_message = f"**Weirdhost继期信息**\n{content}"
             send_telegram_message(telegram_message)
         except TimeoutError as te:
             print(f"❌ 任务执行失败：Playwright 操作超时 ({te})")
-            page.screenshot(path="weirdhost_error_screenshot.png")
+            record_outcome('weirdhost', False)
+            take_screenshot(page, "weirdhost_error_screenshot.png")
         except Exception as e:
             print("❌ 任务执行失败！")
-            page.screenshot(path="weirdhost_final_error_screenshot.png")
+            record_outcome('weirdhost', False)
+            take_screenshot(page, "weirdhost_final_error_screenshot.png")
             print(f"详细错误信息: {e}")
 
         finally:
-            page.close()
-            context.close()
-    else:
+            close_context(context, page)
+    elif weirdhost_done_over_http:
+        print("\n--- ℹ️ Weirdhost 任务已通过 HTTP 完成，跳过浏览器流程。 ---")
+    elif weirdhost_configured:
+        print("\n--- ℹ️ 跳过 Weirdhost 任务：目标站点预检失败。 ---")
+    elif 'weirdhost' in tasks:
         print("\n--- ℹ️ 跳过 Weirdhost 任务：未配置 WEIRDHOST_EMAIL/PASSWORD 或 remember_web_cookie。 ---")
 
 
     # ---------------------
-    browser.close()
+    if browser and owns_browser:
+        browser.close()
+        playwright_farm.release(remote_node)
+        for line in playwright_farm.report():
+            print(f"🌐 远程节点统计 {line}")
+    perf_collector.write_report()
+    if asset_cache.enabled:
+        asset_cache.save()
+        print(f"📦 {asset_cache.report()}")
     print("\n--- 所有任务执行完毕 ---")
+    return {'notifications': notifications, 'outcomes': outcomes}
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     with sync_playwright() as playwright:
         run(playwright)
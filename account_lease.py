@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+跨进程账号租约：leaflow_checkin.py、SuperApp.py 和任务服务处理同一账号前先取得租约
+变量名：ACCOUNT_LEASE（设为 0 关闭）、ACCOUNT_LEASE_DB（默认 account_leases.db）
+        ACCOUNT_LEASE_TTL（租约有效秒数，进程崩溃后到期自动释放，默认 900）
+租约被其他进程持有、或账号今天已经签到完成时跳过该账号；库中只保存邮箱的哈希
+"""
+
+import os
+import socket
+import sqlite3
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger(__name__)
+
+LEASE_ACQUIRED = 'acquired'
+LEASE_HELD = 'held'
+LEASE_DONE = 'done'
+
+# Leaflow 的签到日按北京时间计算
+CHECKIN_DAY_TZ = timezone(timedelta(hours=8))
+
+
+def leaflow_lease_key(email):
+    return 'leaflow:' + hashlib.sha256(email.strip().lower().encode('utf-8')).hexdigest()[:16]
+
+
+def checkin_day():
+    return datetime.now(CHECKIN_DAY_TZ).strftime('%Y-%m-%d')
+
+
+class AccountLeases:
+    """SQLite 中的租约表：BEGIN IMMEDIATE 保证多个进程同时申请时只有一个成功"""
+
+    def __init__(self, db_path=None, ttl=None, enabled=None):
+        self.enabled = enabled if enabled is not None else os.getenv('ACCOUNT_LEASE', '1') != '0'
+        self.db_path = db_path or os.getenv('ACCOUNT_LEASE_DB', 'account_leases.db')
+        self.ttl = ttl or int(os.getenv('ACCOUNT_LEASE_TTL', '900'))
+        self.host = socket.gethostname()
+
+    def _owner(self):
+        # 同一进程内的不同线程也视为不同持有者
+        return f"{self.host}:{os.getpid()}:{threading.get_ident()}"
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS leases (
+                key TEXT PRIMARY KEY,
+                owner TEXT,
+                expires_at REAL NOT NULL DEFAULT 0,
+                done_on TEXT
+            )
+        """)
+        return conn
+
+    def acquire(self, key):
+        """返回 LEASE_ACQUIRED、LEASE_HELD（其他进程正在处理）或 LEASE_DONE（今天已完成）"""
+        if not self.enabled:
+            return LEASE_ACQUIRED
+        try:
+            conn = self._connect()
+        except sqlite3.Error as e:
+            # 租约库不可用时不阻塞签到
+            logger.warning(f"打开租约库 '{self.db_path}' 失败，本次不做跨进程协调: {e}")
+            return LEASE_ACQUIRED
+
+        owner = self._owner()
+        now = time.time()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT owner, expires_at, done_on FROM leases WHERE key = ?", (key,)).fetchone()
+            if row and row[2] == checkin_day():
+                conn.execute("COMMIT")
+                return LEASE_DONE
+            if row and row[0] and row[0] != owner and row[1] > now:
+                conn.execute("COMMIT")
+                return LEASE_HELD
+            conn.execute(
+                "INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at",
+                (key, owner, now + self.ttl)
+            )
+            conn.execute("COMMIT")
+            return LEASE_ACQUIRED
+        except sqlite3.Error as e:
+            logger.warning(f"申请租约失败，本次不做跨进程协调: {e}")
+            return LEASE_ACQUIRED
+        finally:
+            conn.close()
+
+    def release(self, key, done=False):
+        """释放租约；done 为 True 时记录该账号今天已完成"""
+        if not self.enabled:
+            return
+        try:
+            conn = self._connect()
+        except sqlite3.Error as e:
+            logger.warning(f"打开租约库 '{self.db_path}' 失败: {e}")
+            return
+        try:
+            if done:
+                conn.execute("UPDATE leases SET done_on = ? WHERE key = ?", (checkin_day(), key))
+            # 租约已过期并被其他进程取得时不覆盖
+            conn.execute(
+                "UPDATE leases SET owner = NULL, expires_at = 0 WHERE key = ? AND owner = ?", (key, self._owner())
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"释放租约失败，将在 {self.ttl} 秒后自动到期: {e}")
+        finally:
+            conn.close()
+
+
+_leases = None
+_leases_lock = threading.Lock()
+
+
+def get_account_leases():
+    """返回进程内共享的账号租约"""
+    global _leases
+    with _leases_lock:
+        if _leases is None:
+            _leases = AccountLeases()
+        return _leases
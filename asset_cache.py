@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+跨浏览器上下文、跨运行共享的静态资源缓存（按内容寻址）
+变量名：ASSET_CACHE（设为 0 关闭）、ASSET_CACHE_DIR（默认 ~/.cache/leaflow-checkin/assets）
+        ASSET_CACHE_MAX_MB（缓存上限，超出后按最近最少使用淘汰，默认 200）
+        ASSET_CACHE_HOSTS（缓存哪些主机的资源，逗号分隔，默认 leaflow.net,hub.weirdhost.xyz）
+只缓存公开的脚本、样式、字体和图片；cookies 与站点存储仍由各自的上下文隔离
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+CACHEABLE_RESOURCE_TYPES = ('script', 'stylesheet', 'font', 'image')
+# 不写入缓存的响应头，避免跨上下文泄露会话
+UNSHARED_HEADERS = ('set-cookie', 'date', 'age', 'content-length', 'content-encoding', 'transfer-encoding', 'connection')
+# 没有 Last-Modified 时不做启发式缓存；启发式新鲜期最长 1 天
+MAX_HEURISTIC_FRESHNESS = 24 * 3600
+
+
+def freshness_lifetime(headers, now=None):
+    """按 Cache-Control / Expires / Last-Modified 计算可缓存秒数，返回 0 表示不缓存"""
+    now = now or time.time()
+    cache_control = headers.get('cache-control', '').lower()
+    if any(directive in cache_control for directive in ('no-store', 'no-cache', 'private')):
+        return 0
+    if 'set-cookie' in headers:
+        return 0
+
+    match = re.search(r"max-age=(\d+)", cache_control)
+    if match:
+        return int(match.group(1))
+    try:
+        if 'expires' in headers:
+            return max(0, int(parsedate_to_datetime(headers['expires']).timestamp() - now))
+        if 'last-modified' in headers:
+            age = now - parsedate_to_datetime(headers['last-modified']).timestamp()
+            return int(min(max(age, 0) * 0.1, MAX_HEURISTIC_FRESHNESS))
+    except (TypeError, ValueError):
+        return 0
+    return 0
+
+
+class AssetCache:
+    """Playwright 请求拦截填充的磁盘缓存：index.json 记录 URL 到内容哈希的映射，blobs 下按哈希存放内容"""
+
+    def __init__(self, cache_dir=None, max_bytes=None, hosts=None, enabled=None):
+        self.enabled = enabled if enabled is not None else os.getenv('ASSET_CACHE', '1') != '0'
+        self.cache_dir = cache_dir or os.getenv(
+            'ASSET_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'leaflow-checkin', 'assets')
+        )
+        self.max_bytes = max_bytes or int(float(os.getenv('ASSET_CACHE_MAX_MB', '200')) * 1024 * 1024)
+        hosts_str = os.getenv('ASSET_CACHE_HOSTS', 'leaflow.net,hub.weirdhost.xyz')
+        self.hosts = hosts or [host.strip().lower() for host in hosts_str.split(',') if host.strip()]
+        self.blob_dir = os.path.join(self.cache_dir, 'blobs')
+        self.index_path = os.path.join(self.cache_dir, 'index.json')
+        self.lock = threading.Lock()
+        self.index = self._load_index() if self.enabled else {}
+        if self.enabled:
+            self.collect_garbage()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.disk_cache_dirs_in_use = set()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save(self):
+        """把索引写回磁盘，运行结束时调用"""
+        if not self.enabled:
+            return
+        self.collect_garbage()
+        with self.lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f)
+            os.replace(tmp_path, self.index_path)
+
+    def _host_allowed(self, url):
+        host = (urlparse(url).hostname or '').lower()
+        return any(host == rule or host.endswith('.' + rule) for rule in self.hosts)
+
+    def lookup(self, url):
+        """返回未过期的缓存 (条目, 内容)，没有则返回 None"""
+        with self.lock:
+            entry = self.index.get(url)
+            if entry is None:
+                return None
+            if entry['expires_at'] < time.time():
+                self._drop(url)
+                return None
+            entry['last_used'] = time.time()
+        try:
+            with open(os.path.join(self.blob_dir, entry['digest']), 'rb') as f:
+                return entry, f.read()
+        except FileNotFoundError:
+            with self.lock:
+                if self.index.get(url) is entry:
+                    del self.index[url]
+            return None
+
+    def _drop(self, url):
+        """删除索引条目，内容不再被任何条目引用时一并删除（调用方持有锁）"""
+        entry = self.index.pop(url, None)
+        if entry is None or any(e['digest'] == entry['digest'] for e in self.index.values()):
+            return 0
+        try:
+            os.remove(os.path.join(self.blob_dir, entry['digest']))
+        except FileNotFoundError:
+            pass
+        return entry['size']
+
+    def collect_garbage(self):
+        """删除索引中已过期的条目以及不被索引引用的内容文件（含中断写入留下的临时文件）"""
+        now = time.time()
+        with self.lock:
+            for url in [url for url, entry in self.index.items() if entry['expires_at'] < now]:
+                self._drop(url)
+            referenced = {entry['digest'] for entry in self.index.values()}
+        try:
+            names = os.listdir(self.blob_dir)
+        except FileNotFoundError:
+            return 0
+        removed = 0
+        for name in names:
+            if name in referenced:
+                continue
+            path = os.path.join(self.blob_dir, name)
+            try:
+                # 跳过刚写入、可能还没登记到索引的文件
+                if now - os.path.getmtime(path) < 60:
+                    continue
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        if removed:
+            logger.info(f"资源缓存清理了 {removed} 个未引用的文件")
+        return removed
+
+    def store(self, url, status, headers, body):
+        lifetime = freshness_lifetime(headers)
+        if status != 200 or lifetime <= 0 or len(body) > self.max_bytes:
+            return False
+
+        digest = hashlib.sha256(body).hexdigest()
+        blob_path = os.path.join(self.blob_dir, digest)
+        os.makedirs(self.blob_dir, exist_ok=True)
+        if not os.path.exists(blob_path):
+            tmp_path = f"{blob_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, blob_path)
+
+        now = time.time()
+        with self.lock:
+            # 替换旧条目时释放它引用的内容
+            if url in self.index and self.index[url]['digest'] != digest:
+                self._drop(url)
+            self.index[url] = {
+                'digest': digest,
+                'size': len(body),
+                'headers': {k: v for k, v in headers.items() if k.lower() not in UNSHARED_HEADERS},
+                'expires_at': now + lifetime,
+                'last_used': now,
+            }
+            self._evict()
+        return True
+
+    def _evict(self):
+        """总大小超出上限时按最近最少使用淘汰（同一内容只计算一次）"""
+        sizes = {entry['digest']: entry['size'] for entry in self.index.values()}
+        total = sum(sizes.values())
+        for url, entry in sorted(self.index.items(), key=lambda item: item[1]['last_used']):
+            if total <= self.max_bytes:
+                break
+            total -= self._drop(url)
+
+    def handle_route(self, route):
+        """Playwright 路由回调：命中则直接返回缓存内容，否则发出请求并写入缓存"""
+        request = route.request
+        if (request.method != 'GET' or request.resource_type not in CACHEABLE_RESOURCE_TYPES
+                or not self._host_allowed(request.url)):
+            route.continue_()
+            return
+
+        cached = self.lookup(request.url)
+        if cached:
+            entry, body = cached
+            with self.lock:
+                self.hits += 1
+                self.bytes_saved += entry['size']
+            route.fulfill(status=200, headers=entry['headers'], body=body)
+            return
+
+        with self.lock:
+            self.misses += 1
+        try:
+            response = route.fetch()
+            body = response.body()
+        except Exception as e:
+            logger.debug(f"资源请求失败，交还浏览器处理: {e}")
+            route.continue_()
+            return
+        try:
+            self.store(request.url, response.status, response.headers, body)
+        except OSError as e:
+            logger.warning(f"写入资源缓存失败: {e}")
+        route.fulfill(response=response, body=body)
+
+    def route_pattern(self):
+        """只匹配 ASSET_CACHE_HOSTS 中的主机（含子域名和端口）的 URL"""
+        hosts = '|'.join(re.escape(host) for host in self.hosts)
+        return re.compile(rf"^[a-z][a-z0-9+.-]*://([^/?#]*\.)?({hosts})(:\d+)?([/?#]|$)", re.IGNORECASE)
+
+    def attach(self, context):
+        """为浏览器上下文启用共享缓存；只拦截可缓存主机的请求，其余请求不经过 Python"""
+        if self.enabled and self.hosts:
+            context.route(self.route_pattern(), self.handle_route)
+
+    def acquire_disk_cache_dir(self):
+        """为 Chrome 分配一个独占的磁盘缓存目录（Chrome 磁盘缓存不支持多进程同时使用）"""
+        if not self.enabled:
+            return None
+        with self.lock:
+            slot = 0
+            while slot in self.disk_cache_dirs_in_use:
+                slot += 1
+            self.disk_cache_dirs_in_use.add(slot)
+        return os.path.join(self.cache_dir, f"chrome-{slot}")
+
+    def release_disk_cache_dir(self, path):
+        if not path:
+            return
+        with self.lock:
+            self.disk_cache_dirs_in_use.discard(int(path.rsplit('-', 1)[1]))
+
+    def report(self):
+        requests_count = self.hits + self.misses
+        hit_rate = self.hits / requests_count * 100 if requests_count else 0.0
+        return (f"资源缓存命中 {self.hits}/{requests_count} ({hit_rate:.1f}%)，"
+                f"节省 {self.bytes_saved / 1024:.1f} KB，缓存条目 {len(self.index)}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_asset_cache():
+    """返回进程内共享的资源缓存"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AssetCache()
+        return _cache
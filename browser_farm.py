@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+远程浏览器节点池：把浏览器会话分发到多台机器上的 Selenium Grid / Playwright 浏览器服务
+变量名：SELENIUM_REMOTE_NODES（leaflow_checkin.py 使用，例如 http://10.0.0.2:4444|8,http://10.0.0.3:4444|4）
+        PLAYWRIGHT_REMOTE_NODES（SuperApp.py 使用，例如 ws://10.0.0.2:3000/chrome|4）
+        格式为 地址|并发槽位数，逗号分隔，省略槽位数时为 1；未配置时在本机启动浏览器
+        BROWSER_FARM_ATTEMPTS（建立会话失败时最多尝试几个节点，默认 3）
+会话在使用中断开时，leaflow_checkin.py 把该节点记为失败并在其他节点上重试该账号一次
+本地测试：启动多个 `java -jar selenium-server.jar standalone --port 444x`
+          或 `npx playwright run-server --port 300x`，再把地址写入对应变量
+"""
+
+import os
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserNode:
+    """单个远程浏览器节点及其运行统计"""
+
+    def __init__(self, url, slots):
+        self.url = url
+        self.slots = slots
+        self.in_use = 0
+        self.failures = 0
+        self.removed = False
+        self.sessions = 0
+        self.errors = 0
+
+    @property
+    def free_slots(self):
+        return self.slots - self.in_use
+
+
+def parse_nodes(nodes_str):
+    """解析 地址|槽位数 列表，格式错误的条目记录警告后跳过"""
+    nodes = []
+    for item in [item.strip() for item in nodes_str.split(',') if item.strip()]:
+        url, _, slots = item.partition('|')
+        if not slots:
+            slots = '1'
+        if not url.strip() or not slots.strip().isdigit() or int(slots) < 1:
+            logger.warning(f"远程浏览器节点格式错误，已跳过: {item}")
+            continue
+        nodes.append(BrowserNode(url.strip(), int(slots)))
+    return nodes
+
+
+class BrowserFarm:
+    """按空闲槽位数分配节点；建立会话失败时换一个节点重试，连续失败的节点被移除"""
+
+    def __init__(self, nodes, attempts=None, max_failures=2):
+        self.nodes = nodes
+        self.attempts = attempts or int(os.getenv('BROWSER_FARM_ATTEMPTS', '3'))
+        self.max_failures = max_failures
+        self.condition = threading.Condition()
+
+    @property
+    def enabled(self):
+        return bool(self.nodes)
+
+    def _acquire(self, exclude):
+        """选择空闲槽位最多的节点，全部占满时等待其他会话释放"""
+        with self.condition:
+            while True:
+                candidates = [node for node in self.nodes if not node.removed and node not in exclude]
+                if not candidates:
+                    return None
+                node = max(candidates, key=lambda n: n.free_slots)
+                if node.free_slots > 0:
+                    node.in_use += 1
+                    return node
+                self.condition.wait()
+
+    def release(self, node, success=True):
+        """归还节点槽位；会话失败时累计节点的连续失败次数"""
+        if node is None:
+            return
+        with self.condition:
+            node.in_use -= 1
+            if success:
+                node.failures = 0
+            else:
+                node.errors += 1
+                node.failures += 1
+                if node.failures >= self.max_failures and not node.removed:
+                    node.removed = True
+                    logger.warning(f"远程浏览器节点 {node.url} 连续失败 {node.failures} 次，已移除")
+            self.condition.notify_all()
+
+    def open(self, connect, exclude=None):
+        """用 connect(node) 建立会话，失败时换节点重试，返回 (节点, 会话)；会话结束后调用 release(节点)
+        exclude 中的节点不参与分配（例如刚刚断开会话的节点）"""
+        tried = list(exclude or [])
+        last_error = None
+        for _ in range(self.attempts):
+            node = self._acquire(tried)
+            if node is None:
+                break
+            try:
+                session = connect(node)
+            except Exception as e:
+                logger.warning(f"在远程浏览器节点 {node.url} 建立会话失败，尝试其他节点: {e}")
+                tried.append(node)
+                last_error = e
+                self.release(node, success=False)
+                continue
+            with self.condition:
+                node.sessions += 1
+            return node, session
+        raise RuntimeError(f"没有可用的远程浏览器节点（已尝试 {len(tried)} 个）: {last_error}")
+
+    def report(self):
+        """每个节点一行：槽位、会话数、失败数"""
+        lines = []
+        for node in self.nodes:
+            status = "已移除" if node.removed else "可用"
+            lines.append(f"{node.url} [{status}]: 槽位 {node.slots}, 会话 {node.sessions}, 失败 {node.errors}")
+        return lines
+
+
+_farms = {}
+_farms_lock = threading.Lock()
+
+
+def _get_farm(variable):
+    with _farms_lock:
+        if variable not in _farms:
+            _farms[variable] = BrowserFarm(parse_nodes(os.getenv(variable, '')))
+        return _farms[variable]
+
+
+def get_selenium_farm():
+    """返回进程内共享的 Selenium 远程节点池，未配置时为空池（本机启动浏览器）"""
+    return _get_farm('SELENIUM_REMOTE_NODES')
+
+
+def get_playwright_farm():
+    """返回进程内共享的 Playwright 远程节点池，未配置时为空池（本机启动浏览器）"""
+    return _get_farm('PLAYWRIGHT_REMOTE_NODES')
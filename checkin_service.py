@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+签到/续期任务服务：HTTP API + 持久化任务队列 + 常驻浏览器 worker 池
+
+启动：python checkin_service.py --port 8080 --workers 2
+接口：
+  POST /jobs                  提交任务 {"tenant": "t1", "kind": "leaflow", "payload": {"email": "...", "password": "..."}}
+                              kind 为 superapp 时 payload 为 {"env": {"LEAFLOW_ACCOUNTS": "...", ...}}
+  GET  /jobs?tenant=t1        列出租户的任务
+  GET  /jobs/<id>             查询任务状态
+  GET  /jobs/<id>/result      获取任务结果（未完成时返回 409）
+  GET  /health                服务状态（任务数、每个代理的吞吐统计）
+变量名：CHECKIN_SERVICE_DB（任务库路径）、CHECKIN_SERVICE_TOKEN（Bearer 鉴权，可选）
+        CHECKIN_SERVICE_TENANT_LIMIT（每租户默认并发，默认 1）、CHECKIN_SERVICE_TENANT_LIMITS（租户1=并发,租户2=并发）
+本地测试时把 LEAFLOW_LOGIN_URL / LEAFLOW_CHECKIN_URL / LEAFLOW_HOME_URL / WEIRDHOST_BASE_URL 指向替身站点，并设置 PREFLIGHT_CHECK=0
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from proxy_pool import get_proxy_pool
+from browser_farm import get_playwright_farm, get_selenium_farm
+from account_lease import LEASE_ACQUIRED, LEASE_DONE, get_account_leases, leaflow_lease_key
+from credential_quarantine import get_quarantine
+from perf_metrics import get_perf_collector
+
+logger = logging.getLogger(__name__)
+
+JOB_KINDS = ('leaflow', 'superapp')
+
+# superapp 任务允许传入的配置项（不允许租户指定服务器上的文件路径）
+SUPERAPP_ENV_KEYS = (
+    'LEAFLOW_ACCOUNTS', 'WEIRDHOST_EMAIL', 'WEIRDHOST_PASSWORD', 'WEIRDHOST_LOGIN_URL',
+    'REMEMBER_WEB_COOKIE', 'TELEGRAM_BOT_TOKEN', 'TELEGRAM_CHAT_ID', 'WEIRDHOST_HTTP_RENEWAL',
+    'WEIRDHOST_RENEW_TIMEOUT',
+)
+
+
+class JobStore:
+    """基于 SQLite 的持久化任务队列"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    tenant TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+            # 上次进程退出时仍在运行的任务重新排队
+            self.conn.execute("UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'")
+
+    def submit(self, tenant, kind, payload):
+        job_id = uuid.uuid4().hex
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO jobs (id, tenant, kind, payload, status, created_at) VALUES (?, ?, ?, ?, 'queued', ?)",
+                (job_id, tenant, kind, json.dumps(payload), time.time())
+            )
+        return job_id
+
+    def claim(self, tenant_limit):
+        """按提交顺序取出第一个未超出租户并发上限的任务并标记为运行中"""
+        with self.lock, self.conn:
+            running = dict(self.conn.execute(
+                "SELECT tenant, COUNT(*) FROM jobs WHERE status = 'running' GROUP BY tenant"
+            ).fetchall())
+            for row in self.conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at"):
+                if running.get(row['tenant'], 0) >= tenant_limit(row['tenant']):
+                    continue
+                self.conn.execute(
+                    "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?", (time.time(), row['id'])
+                )
+                return dict(row)
+        return None
+
+    def finish(self, job_id, success, result=None, error=None):
+        # 任务结束后清除 payload 中的凭证
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, payload = '{}', finished_at = ? WHERE id = ?",
+                ('succeeded' if success else 'failed', json.dumps(result, ensure_ascii=False),
+                 error, time.time(), job_id)
+            )
+
+    def get(self, job_id):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._public(row) if row else None
+
+    def list(self, tenant=None):
+        with self.lock:
+            if tenant:
+                rows = self.conn.execute(
+                    "SELECT * FROM jobs WHERE tenant = ? ORDER BY created_at DESC LIMIT 100", (tenant,)
+                ).fetchall()
+            else:
+                rows = self.conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT 100").fetchall()
+        return [self._public(row) for row in rows]
+
+    def counts(self):
+        with self.lock:
+            return dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    @staticmethod
+    def _public(row):
+        job = {k: row[k] for k in row.keys() if k != 'payload'}
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+
+class Worker(threading.Thread):
+    """常驻 worker：按需启动浏览器并在多个任务之间复用"""
+
+    def __init__(self, service, index):
+        super().__init__(name=f"checkin-worker-{index}", daemon=True)
+        self.service = service
+        self.driver = None
+        self.driver_node = None
+        self.driver_proxy = None
+        self.playwright_manager = None
+        self.playwright = None
+        self.browser = None
+        self.browser_node = None
+
+    def run(self):
+        try:
+            while not self.service.stopping.is_set():
+                job = self.service.store.claim(self.service.tenant_limit)
+                if job is None:
+                    self.service.wait_for_jobs()
+                    continue
+                self.execute(job)
+        finally:
+            self.close()
+
+    def execute(self, job):
+        logger.info(f"[{self.name}] 开始执行任务 {job['id']} ({job['tenant']}/{job['kind']})")
+        payload = json.loads(job['payload'])
+        try:
+            if job['kind'] == 'leaflow':
+                success, result = self.run_leaflow(payload)
+            else:
+                success, result = self.run_superapp(payload)
+            self.service.store.finish(job['id'], success, result)
+        except Exception as e:
+            logger.error(f"[{self.name}] 任务 {job['id']} 执行出错: {e}")
+            self.service.store.finish(job['id'], False, error=str(e))
+            self.discard_broken_browsers()
+        finally:
+            self.service.notify()
+
+    def run_leaflow(self, payload):
+        import leaflow_checkin
+
+        # 与其他入口一致：凭证多次被拒绝的账号在凭证变更前不再启动浏览器
+        quarantine_reason = get_quarantine().is_quarantined(payload['email'], payload['password'])
+        if quarantine_reason:
+            return False, {'message': f"凭证错误已隔离，跳过: {quarantine_reason}"}
+
+        # 与定时工作流共享跨进程租约，同一账号不会同时在两处签到
+        leases = get_account_leases()
+        lease_key = leaflow_lease_key(payload['email'])
+        lease_state = leases.acquire(lease_key)
+        if lease_state == LEASE_DONE:
+            return True, {'message': "今日已由其他进程完成签到"}
+        if lease_state != LEASE_ACQUIRED:
+            return False, {'message': "账号正由其他进程签到，请稍后重试"}
+
+        proxy_pool = get_proxy_pool()
+        success = False
+        try:
+            if self.driver is None:
+                # 常驻浏览器的代理在启动时固定，因此按 worker 分配代理（Chrome 命令行代理不支持认证）
+                proxy = proxy_pool.assign(self.name, require_unauthenticated=True)
+                farm = get_selenium_farm()
+                if farm.enabled:
+                    self.driver_node, self.driver = farm.open(
+                        lambda node: leaflow_checkin.create_driver(proxy, remote_url=node.url)
+                    )
+                else:
+                    self.driver = leaflow_checkin.create_driver(proxy)
+                self.driver_proxy = proxy
+            started_at = time.monotonic()
+            try:
+                auto_checkin = leaflow_checkin.LeaflowAutoCheckin(
+                    payload['email'], payload['password'], driver=self.driver
+                )
+                success, message = auto_checkin.run()
+            finally:
+                proxy_pool.report_result(self.driver_proxy, success, time.monotonic() - started_at)
+                # 写出本次任务的性能报告并清空记录，常驻服务中不会无限累积
+                get_perf_collector().write_report()
+        finally:
+            leases.release(lease_key, done=success)
+        if not success:
+            self.discard_broken_browsers()
+        if self.driver_proxy is not None and self.driver_proxy.removed:
+            # 代理已被移除，下一个任务换代理重新启动浏览器
+            self.close_driver()
+        return success, {'message': message}
+
+    def run_superapp(self, payload):
+        from playwright.sync_api import sync_playwright
+        import SuperApp
+
+        # SuperApp 不会替传入的浏览器重连，远程节点或本地 Chromium 已断开时先丢弃
+        if self.browser is not None and not self.browser.is_connected():
+            logger.warning(f"[{self.name}] 常驻浏览器已断开，重新启动")
+            self.close_playwright(success=False)
+        if self.browser is None:
+            # Playwright 同步接口绑定创建它的线程，因此每个 worker 各自持有
+            self.playwright_manager = sync_playwright()
+            self.playwright = self.playwright_manager.start()
+            farm = get_playwright_farm()
+            if farm.enabled:
+                self.browser_node, self.browser = farm.open(lambda node: self.playwright.chromium.connect(node.url))
+            else:
+                self.browser = self.playwright.chromium.launch(headless=True)
+        env = {k: str(v) for k, v in payload.get('env', {}).items() if k in SUPERAPP_ENV_KEYS}
+        result = SuperApp.run(self.playwright, browser=self.browser, env=env)
+        # 没有执行任何任务或任一任务失败时，任务状态为失败
+        outcomes = result['outcomes']
+        success = bool(outcomes) and all(outcomes.values())
+        if not success:
+            self.discard_broken_browsers()
+        return success, {'notifications': result['notifications'], 'outcomes': outcomes}
+
+    def discard_broken_browsers(self):
+        """浏览器失去响应时丢弃，下一个任务重新启动"""
+        if self.driver is not None:
+            try:
+                self.driver.title
+            except Exception:
+                self.close_driver(success=False)
+        if self.browser is not None and not self.browser.is_connected():
+            self.close_playwright(success=False)
+
+    def close_driver(self, success=True):
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+        get_selenium_farm().release(self.driver_node, success=success)
+        self.driver = self.driver_node = self.driver_proxy = None
+
+    def close_playwright(self, success=True):
+        try:
+            if self.browser is not None:
+                self.browser.close()
+            self.playwright_manager.__exit__(None, None, None)
+        except Exception:
+            pass
+        get_playwright_farm().release(self.browser_node, success=success)
+        self.browser = self.playwright = self.playwright_manager = self.browser_node = None
+
+    def close(self):
+        if self.driver is not None:
+            self.close_driver()
+        if self.playwright_manager is not None:
+            self.close_playwright()
+
+
+class CheckinService:
+    """任务队列、worker 池和租户并发限制"""
+
+    def __init__(self, db_path, workers=2, default_tenant_limit=1, tenant_limits=None, token=''):
+        self.store = JobStore(db_path)
+        self.default_tenant_limit = default_tenant_limit
+        self.tenant_limits = tenant_limits or {}
+        self.token = token
+        self.stopping = threading.Event()
+        self.condition = threading.Condition()
+        self.workers = [Worker(self, i + 1) for i in range(workers)]
+
+    def tenant_limit(self, tenant):
+        return self.tenant_limits.get(tenant, self.default_tenant_limit)
+
+    def submit(self, tenant, kind, payload):
+        job_id = self.store.submit(tenant, kind, payload)
+        self.notify()
+        return job_id
+
+    def notify(self):
+        with self.condition:
+            self.condition.notify_all()
+
+    def wait_for_jobs(self, timeout=1.0):
+        with self.condition:
+            self.condition.wait(timeout)
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    def stop(self):
+        self.stopping.set()
+        self.notify()
+        for worker in self.workers:
+            worker.join()
+
+
+def validate_job_request(body):
+    """校验提交的任务，返回 (tenant, kind, payload)，格式错误时抛出 ValueError"""
+    if not isinstance(body, dict):
+        raise ValueError("请求体必须是 JSON 对象")
+    tenant = str(body.get('tenant', '')).strip()
+    kind = body.get('kind')
+    payload = body.get('payload')
+    if not tenant:
+        raise ValueError("缺少 tenant")
+    if kind not in JOB_KINDS:
+        raise ValueError(f"kind 必须是 {', '.join(JOB_KINDS)} 之一")
+    if not isinstance(payload, dict):
+        raise ValueError("payload 必须是 JSON 对象")
+    if kind == 'leaflow' and not (payload.get('email') and payload.get('password')):
+        raise ValueError("leaflow 任务需要 email 和 password")
+    if kind == 'superapp' and not isinstance(payload.get('env'), dict):
+        raise ValueError("superapp 任务需要 env 对象")
+    return tenant, kind, payload
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            logger.info("%s - %s" % (self.address_string(), format % args))
+
+        def send_json(self, status, data):
+            body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def authorized(self):
+            if not service.token:
+                return True
+            if self.headers.get('Authorization') == f"Bearer {service.token}":
+                return True
+            self.send_json(401, {'error': '未授权'})
+            return False
+
+        def do_POST(self):
+            if not self.authorized():
+                return
+            if urlparse(self.path).path != '/jobs':
+                return self.send_json(404, {'error': '未知接口'})
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                tenant, kind, payload = validate_job_request(json.loads(self.rfile.read(length) or b'null'))
+            except (ValueError, json.JSONDecodeError) as e:
+                return self.send_json(400, {'error': str(e)})
+            job_id = service.submit(tenant, kind, payload)
+            self.send_json(202, {'id': job_id, 'status': 'queued'})
+
+        def do_GET(self):
+            if not self.authorized():
+                return
+            url = urlparse(self.path)
+            parts = [part for part in url.path.split('/') if part]
+
+            if parts == ['health']:
+                return self.send_json(200, {
+                    'workers': len(service.workers), 'jobs': service.store.counts(),
+                    'proxies': get_proxy_pool().report(),
+                })
+            if parts == ['jobs']:
+                tenant = parse_qs(url.query).get('tenant', [None])[0]
+                return self.send_json(200, {'jobs': service.store.list(tenant)})
+            if len(parts) in (2, 3) and parts[0] == 'jobs':
+                job = service.store.get(parts[1])
+                if job is None:
+                    return self.send_json(404, {'error': '任务不存在'})
+                if len(parts) == 2:
+                    return self.send_json(200, job)
+                if parts[2] == 'result':
+                    if job['status'] in ('queued', 'running'):
+                        return self.send_json(409, {'id': job['id'], 'status': job['status']})
+                    return self.send_json(200, {
+                        'id': job['id'], 'status': job['status'], 'result': job['result'], 'error': job['error']
+                    })
+            self.send_json(404, {'error': '未知接口'})
+
+    return Handler
+
+
+def parse_tenant_limits(limits_str):
+    """解析 CHECKIN_SERVICE_TENANT_LIMITS，格式：租户=并发数，逗号分隔"""
+    limits = {}
+    for item in [part.strip() for part in limits_str.split(',') if part.strip()]:
+        try:
+            tenant, limit = item.split('=', 1)
+            limits[tenant.strip()] = max(1, int(limit))
+        except ValueError:
+            logger.warning(f"跳过格式错误的租户并发配置 '{item}'")
+    return limits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="签到/续期任务服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--db', default=os.getenv('CHECKIN_SERVICE_DB', 'checkin_jobs.db'))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    service = CheckinService(
+        args.db,
+        workers=args.workers,
+        default_tenant_limit=max(1, int(os.getenv('CHECKIN_SERVICE_TENANT_LIMIT', '1'))),
+        tenant_limits=parse_tenant_limits(os.getenv('CHECKIN_SERVICE_TENANT_LIMITS', '')),
+        token=os.getenv('CHECKIN_SERVICE_TOKEN', ''),
+    )
+    service.start()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    logger.info(f"任务服务已启动: http://{args.host}:{args.port}，worker 数: {args.workers}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+统一命令行入口：先校验配置，再只导入本次需要的浏览器引擎
+
+  python cli.py leaflow [--engine selenium|playwright]   Leaflow 多账号签到
+  python cli.py weirdhost                                Weirdhost 续期
+  python cli.py all                                      Leaflow 签到（Selenium）+ Weirdhost 续期
+  子命令后加上 --dry-run 只校验配置并打印执行计划，不启动浏览器
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+
+from config import validate_common, validate_leaflow_playwright, validate_leaflow_selenium, validate_weirdhost
+
+logger = logging.getLogger(__name__)
+
+
+def build_plan(args, env):
+    """校验本次要执行的流程，返回 (执行计划, 错误列表)"""
+    plan = []
+    errors = validate_common(env)
+
+    if args.command in ('leaflow', 'all'):
+        engine = getattr(args, 'engine', 'selenium')
+        if engine == 'selenium':
+            accounts, leaflow_errors = validate_leaflow_selenium(env)
+        else:
+            accounts, leaflow_errors = validate_leaflow_playwright(env)
+        errors += leaflow_errors
+        plan.append(f"Leaflow 签到：{len(accounts)} 个账号，引擎 {engine}")
+
+    if args.command in ('weirdhost', 'all'):
+        errors += validate_weirdhost(env)
+        plan.append("Weirdhost 续期：优先 HTTP，失败时回退到 Playwright")
+
+    return plan, errors
+
+
+def run_leaflow_selenium():
+    from leaflow_checkin import MultiAccountManager
+
+    _, results = MultiAccountManager().run_all()
+    success_count = sum(1 for _, success, _ in results if success)
+    logger.info(f"Leaflow 签到完成: {success_count}/{len(results)} 成功")
+
+
+def run_superapp(tasks):
+    from playwright.sync_api import sync_playwright
+    import SuperApp
+
+    with sync_playwright() as playwright:
+        SuperApp.run(playwright, tasks=tasks)
+
+
+def main(argv=None):
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--dry-run', action='store_true', help="只校验配置并打印执行计划")
+    parser = argparse.ArgumentParser(description="Leaflow 签到 / Weirdhost 续期")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    leaflow_parser = subparsers.add_parser('leaflow', parents=[common], help="Leaflow 多账号签到")
+    leaflow_parser.add_argument(
+        '--engine', choices=('selenium', 'playwright'), default='selenium',
+        help="selenium 使用 leaflow_checkin.py（LEAFLOW_ACCOUNTS 格式 邮箱:密码,...），"
+             "playwright 使用 SuperApp.py（格式 邮箱,密码 ...）"
+    )
+    subparsers.add_parser('weirdhost', parents=[common], help="Weirdhost 服务器续期")
+    subparsers.add_parser('all', parents=[common], help="Leaflow 签到（Selenium）和 Weirdhost 续期")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    started_at = time.monotonic()
+    plan, errors = build_plan(args, os.environ)
+
+    if errors:
+        for error in errors:
+            logger.error(f"配置错误: {error}")
+        return 2
+
+    for step in plan:
+        logger.info(f"执行计划: {step}")
+    if args.dry_run:
+        logger.info(f"配置校验通过（dry run，耗时 {(time.monotonic() - started_at) * 1000:.1f} ms），未启动浏览器")
+        return 0
+
+    try:
+        if args.command == 'leaflow' and args.engine == 'playwright':
+            run_superapp(tasks=('leaflow',))
+        elif args.command in ('leaflow', 'all'):
+            run_leaflow_selenium()
+        if args.command in ('weirdhost', 'all'):
+            run_superapp(tasks=('weirdhost',))
+        # 与 leaflow_checkin.py 一致：部分账号失败不视为脚本错误
+        return 0
+    except Exception as e:
+        logger.error(f"❌ 脚本执行出错: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
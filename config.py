@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+配置解析与校验（只依赖标准库，可在启动任何浏览器之前运行）
+"""
+
+import os
+import re
+from typing import List, Mapping, Tuple
+from urllib.parse import urlparse
+
+# 定义账户凭证类型
+AccountCredentials = List[Tuple[str, str]]
+
+
+def parse_colon_accounts(accounts_str: str) -> Tuple[AccountCredentials, List[str]]:
+    """解析 leaflow_checkin.py 的 LEAFLOW_ACCOUNTS：邮箱1:密码1,邮箱2:密码2，返回 (账号列表, 错误列表)"""
+    accounts: AccountCredentials = []
+    errors: List[str] = []
+    for i, pair in enumerate([pair.strip() for pair in accounts_str.split(',') if pair.strip()], 1):
+        if ':' not in pair:
+            errors.append(f"LEAFLOW_ACCOUNTS 第 {i} 个账号缺少冒号分隔符，请使用 '邮箱:密码' 格式")
+            continue
+        email, password = [part.strip() for part in pair.split(':', 1)]
+        if email and password:
+            accounts.append((email, password))
+        else:
+            errors.append(f"LEAFLOW_ACCOUNTS 第 {i} 个账号的邮箱或密码为空")
+    return accounts, errors
+
+
+def parse_space_accounts(accounts_str: str) -> Tuple[AccountCredentials, List[str]]:
+    """解析 SuperApp.py 的 LEAFLOW_ACCOUNTS：邮箱1,密码1 邮箱2,密码2，返回 (账号列表, 错误列表)"""
+    accounts: AccountCredentials = []
+    errors: List[str] = []
+    # 账户之间用空格分隔，邮箱和密码之间用逗号分隔
+    for i, pair in enumerate([pair.strip() for pair in accounts_str.split(' ') if pair.strip()], 1):
+        parts = [part.strip() for part in pair.split(',') if part.strip()]
+        if len(parts) == 2:
+            accounts.append((parts[0], parts[1]))
+        else:
+            errors.append(f"LEAFLOW_ACCOUNTS 第 {i} 个账户格式错误，请使用 '邮箱,密码' 格式")
+    return accounts, errors
+
+
+def validate_leaflow_selenium(env: Mapping[str, str]) -> Tuple[AccountCredentials, List[str]]:
+    """校验 leaflow_checkin.py 的账号配置（LEAFLOW_ACCOUNTS 或 LEAFLOW_EMAIL/LEAFLOW_PASSWORD）"""
+    accounts, errors = parse_colon_accounts(env.get('LEAFLOW_ACCOUNTS', '').strip())
+    if not accounts:
+        email = env.get('LEAFLOW_EMAIL', '').strip()
+        password = env.get('LEAFLOW_PASSWORD', '').strip()
+        if email and password:
+            accounts = [(email, password)]
+        elif not errors:
+            errors.append("未找到有效的账号配置：请设置 LEAFLOW_ACCOUNTS (email1:pass1,email2:pass2) 或 LEAFLOW_EMAIL 和 LEAFLOW_PASSWORD")
+    errors += _validate_int(env, 'LEAFLOW_MAX_WORKERS', minimum=1)
+    return accounts, errors
+
+
+def validate_leaflow_playwright(env: Mapping[str, str]) -> Tuple[AccountCredentials, List[str]]:
+    """校验 SuperApp.py 的 Leaflow 账号配置"""
+    accounts, errors = parse_space_accounts(env.get('LEAFLOW_ACCOUNTS', ''))
+    if not accounts and not errors:
+        errors.append("未配置 LEAFLOW_ACCOUNTS：格式为 '邮箱1,密码1 邮箱2,密码2'")
+    return accounts, errors
+
+
+def validate_weirdhost(env: Mapping[str, str]) -> List[str]:
+    """校验 Weirdhost 续期配置：需要服务器 URL 和至少一种登录方式"""
+    errors: List[str] = []
+    login_url = env.get('WEIRDHOST_LOGIN_URL', '')
+    if not login_url:
+        errors.append("未配置 WEIRDHOST_LOGIN_URL（进入续期界面后复制的完整 URL）")
+    else:
+        parts = urlparse(login_url)
+        if parts.scheme not in ('http', 'https') or not re.search(r"/server/[^/?#]+", parts.path):
+            errors.append(f"WEIRDHOST_LOGIN_URL 格式错误，应类似 https://hub.weirdhost.xyz/server/xxxxxxxx")
+
+    cookie_file = env.get('WEIRDHOST_COOKIE_FILE', '')
+    has_cookie = bool(env.get('REMEMBER_WEB_COOKIE', '')) or bool(cookie_file and os.path.exists(cookie_file))
+    has_password = bool(env.get('WEIRDHOST_EMAIL', '') and env.get('WEIRDHOST_PASSWORD', ''))
+    if not has_cookie and not has_password:
+        errors.append("Weirdhost 缺少登录方式：请设置 REMEMBER_WEB_COOKIE、WEIRDHOST_COOKIE_FILE 或 WEIRDHOST_EMAIL 和 WEIRDHOST_PASSWORD")
+    errors += _validate_int(env, 'WEIRDHOST_RENEW_TIMEOUT', minimum=1)
+    return errors
+
+
+def validate_common(env: Mapping[str, str]) -> List[str]:
+    """校验各流程共用的可选配置"""
+    errors: List[str] = []
+    if bool(env.get('TELEGRAM_BOT_TOKEN', '')) != bool(env.get('TELEGRAM_CHAT_ID', '')):
+        errors.append("TELEGRAM_BOT_TOKEN 和 TELEGRAM_CHAT_ID 需要同时设置")
+    for item in [part.strip() for part in env.get('RATE_LIMITS', '').split(',') if part.strip()]:
+        match = re.fullmatch(r"[\w.-]+=(\d+)/(\d+(\.\d+)?)", item)
+        if not match:
+            errors.append(f"RATE_LIMITS 规则 '{item}' 格式错误，请使用 '主机=次数/秒数'")
+        elif int(match.group(1)) < 1 or float(match.group(2)) <= 0:
+            errors.append(f"RATE_LIMITS 规则 '{item}' 的次数和秒数必须大于 0")
+    for i, url in enumerate([part.strip() for part in env.get('PROXY_POOL', '').split(',') if part.strip()], 1):
+        try:
+            parts = urlparse(url)
+            valid = bool(parts.scheme and parts.hostname and parts.port)
+        except ValueError:
+            valid = False
+        if not valid:
+            # 不输出代理地址本身，其中可能包含认证信息
+            errors.append(f"PROXY_POOL 第 {i} 个代理格式错误，请使用 'scheme://host:port'")
+    errors += _validate_int(env, 'ACCOUNT_LEASE_TTL', minimum=1)
+    for name in ('SELENIUM_REMOTE_NODES', 'PLAYWRIGHT_REMOTE_NODES'):
+        for item in [part.strip() for part in env.get(name, '').split(',') if part.strip()]:
+            if not re.fullmatch(r"[a-z]+://[^|\s]+(\|[1-9]\d*)?", item):
+                errors.append(f"{name} 节点 '{item}' 格式错误，请使用 '地址|并发槽位数'")
+    errors += _validate_int(env, 'BROWSER_FARM_ATTEMPTS', minimum=1)
+    return errors
+
+
+def _validate_int(env: Mapping[str, str], name: str, minimum: int) -> List[str]:
+    value = env.get(name, '')
+    if value and (not value.strip().isdigit() or int(value) < minimum):
+        return [f"{name} 必须是不小于 {minimum} 的整数"]
+    return []
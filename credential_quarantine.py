@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+登录凭证失败隔离：站点多次明确提示密码错误的账号，在凭证变更或记录过期前不再执行
+变量名：CREDENTIAL_QUARANTINE_FILE（默认 credential_quarantine.json）
+        CREDENTIAL_QUARANTINE_THRESHOLD（连续几次密码错误后隔离，默认 2）
+        CREDENTIAL_QUARANTINE_DAYS（隔离记录有效天数，默认 7）
+文件中不保存明文：账号用文件级随机盐的哈希索引，凭证指纹使用每条记录独立随机盐的 PBKDF2
+手动解除：python credential_quarantine.py --clear [邮箱]（不带邮箱时清空全部记录）
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import hmac
+import logging
+import argparse
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 只有明确指出账号或密码错误的提示才计入隔离
+CREDENTIAL_ERROR_KEYWORDS = (
+    '密码错误', '密码不正确', '账号或密码', '帐号或密码', '用户名或密码', '邮箱或密码',
+    '用户不存在', '账号不存在', '帐号不存在', '账户不存在',
+    'incorrect password', 'wrong password', 'invalid credentials', 'invalid email or password',
+)
+# 频率限制和验证码提示即使提到账号也不隔离（「请稍后重试」「try again」常见于普通的密码错误提示，不在此列）
+NON_CREDENTIAL_KEYWORDS = ('频繁', '验证码', 'too many', 'captcha')
+
+PBKDF2_ITERATIONS = 200000
+FILE_VERSION = 2
+
+
+class LoginCredentialError(Exception):
+    """站点明确拒绝了账号或密码"""
+
+
+def is_credential_error(message):
+    message = message.lower()
+    if any(keyword in message for keyword in NON_CREDENTIAL_KEYWORDS):
+        return False
+    return any(keyword in message for keyword in CREDENTIAL_ERROR_KEYWORDS)
+
+
+def mask_email(email):
+    """隐藏邮箱部分字符以保护隐私"""
+    return email[:3] + "***" + email[email.find("@"):]
+
+
+class CredentialQuarantine:
+    """按账号累计密码错误次数，达到阈值后隔离；凭证变化、登录成功或记录过期后解除"""
+
+    def __init__(self, path=None, threshold=None, days=None):
+        self.path = path or os.getenv('CREDENTIAL_QUARANTINE_FILE', 'credential_quarantine.json')
+        self.threshold = threshold or int(os.getenv('CREDENTIAL_QUARANTINE_THRESHOLD', '2'))
+        self.ttl = (days or float(os.getenv('CREDENTIAL_QUARANTINE_DAYS', '7'))) * 24 * 3600
+        self.lock = threading.Lock()
+        self.salt, self.entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict) and data.get('version') == FILE_VERSION:
+                return data['salt'], data['entries']
+            logger.info(f"隔离记录 '{self.path}' 为旧格式，已丢弃")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"读取隔离记录 '{self.path}' 失败，将重新创建: {e}")
+        return os.urandom(16).hex(), {}
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': FILE_VERSION, 'salt': self.salt, 'entries': self.entries},
+                          f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"保存隔离记录 '{self.path}' 失败: {e}")
+
+    def _key(self, email):
+        return hmac.new(bytes.fromhex(self.salt), email.strip().lower().encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+
+    @staticmethod
+    def _fingerprint(email, password, salt):
+        return hashlib.pbkdf2_hmac(
+            'sha256', password.encode('utf-8'), bytes.fromhex(salt) + email.strip().lower().encode('utf-8'),
+            PBKDF2_ITERATIONS
+        ).hex()
+
+    def _matches(self, entry, email, password):
+        return hmac.compare_digest(entry['fingerprint'], self._fingerprint(email, password, entry['salt']))
+
+    def is_quarantined(self, email, password):
+        """账号仍使用多次被拒绝的凭证时返回隔离原因，否则返回 None"""
+        key = self._key(email)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry['last_failure'] > self.ttl:
+                del self.entries[key]
+                self._save()
+                logger.info(f"账号 {mask_email(email)} 的隔离记录已过期，解除隔离")
+                return None
+            if not self._matches(entry, email, password):
+                # 凭证已更新，解除隔离
+                del self.entries[key]
+                self._save()
+                logger.info(f"账号 {mask_email(email)} 的凭证已变更，解除隔离")
+                return None
+            return entry['reason'] if entry['failures'] >= self.threshold else None
+
+    def quarantine(self, email, password, reason):
+        """记录一次密码错误，连续达到阈值后隔离"""
+        key = self._key(email)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or not self._matches(entry, email, password):
+                salt = os.urandom(16).hex()
+                entry = {
+                    'account': mask_email(email),
+                    'salt': salt,
+                    'fingerprint': self._fingerprint(email, password, salt),
+                    'failures': 0,
+                }
+                self.entries[key] = entry
+            entry['failures'] += 1
+            entry['reason'] = reason
+            entry['last_failure'] = time.time()
+            entry['since'] = time.strftime('%Y-%m-%d %H:%M:%S')
+            failures = entry['failures']
+            self._save()
+        if failures >= self.threshold:
+            logger.warning(f"账号 {mask_email(email)} 连续 {failures} 次凭证被拒绝，已隔离: {reason}")
+        else:
+            logger.warning(f"账号 {mask_email(email)} 凭证被拒绝（{failures}/{self.threshold}），暂不隔离: {reason}")
+
+    def clear(self, email=None):
+        """清除指定账号的记录（登录成功或手动解除），不传邮箱时清空全部，返回清除的条数"""
+        with self.lock:
+            if email is None:
+                count = len(self.entries)
+                self.entries.clear()
+            else:
+                count = 1 if self.entries.pop(self._key(email), None) is not None else 0
+            if count:
+                self._save()
+        return count
+
+
+_quarantine = None
+_quarantine_lock = threading.Lock()
+
+
+def get_quarantine():
+    """返回进程内共享的隔离记录"""
+    global _quarantine
+    with _quarantine_lock:
+        if _quarantine is None:
+            _quarantine = CredentialQuarantine()
+        return _quarantine
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="管理登录凭证隔离记录")
+    parser.add_argument('--clear', nargs='?', const='', metavar='EMAIL', required=True,
+                        help="解除指定邮箱的隔离，不带邮箱时清空全部记录")
+    args = parser.parse_args(argv)
+    count = get_quarantine().clear(args.clear or None)
+    print(f"已清除 {count} 条隔离记录")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
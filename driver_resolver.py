@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+chromedriver 解析与缓存：首次解析后写入版本清单，之后的运行不再访问网络
+变量名：DRIVER_CACHE_DIR（默认 ~/.cache/leaflow-checkin）、DRIVER_OFFLINE（设为 1 时完全离线）
+        CHROME_BINARY（Chrome 可执行文件路径，默认在 PATH 中查找）
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import logging
+import threading
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+CHROME_CANDIDATES = ('google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome')
+
+
+def detect_chrome():
+    """查找本机 Chrome 并读取版本号，返回 (路径, 版本)，找不到时返回 (None, None)"""
+    configured = os.getenv('CHROME_BINARY', '')
+    candidates = [configured] if configured else [shutil.which(name) for name in CHROME_CANDIDATES]
+    for binary in filter(None, candidates):
+        try:
+            output = subprocess.run(
+                [binary, '--version'], capture_output=True, text=True, timeout=10
+            ).stdout
+        except (OSError, subprocess.SubprocessError):
+            continue
+        match = re.search(r"(\d+\.\d+\.\d+\.\d+)", output)
+        if match:
+            return binary, match.group(1)
+    return None, None
+
+
+def major_version(version):
+    return version.split('.', 1)[0] if version else None
+
+
+class DriverResolver:
+    """解析 chromedriver 路径，结果写入缓存目录下的 driver_manifest.json"""
+
+    def __init__(self, cache_dir=None, offline=None):
+        self.cache_dir = cache_dir or os.getenv(
+            'DRIVER_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'leaflow-checkin')
+        )
+        self.offline = offline if offline is not None else os.getenv('DRIVER_OFFLINE', '0') == '1'
+        self.manifest_path = os.path.join(self.cache_dir, 'driver_manifest.json')
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save_manifest(self, manifest):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def download(self):
+        """通过 webdriver-manager 下载与本机 Chrome 匹配的驱动到缓存目录"""
+        from webdriver_manager.chrome import ChromeDriverManager
+        from webdriver_manager.core.driver_cache import DriverCacheManager
+
+        return ChromeDriverManager(cache_manager=DriverCacheManager(root_dir=self.cache_dir)).install()
+
+    def resolve(self):
+        """返回 (驱动路径, 来源)；驱动路径为 None 时交给 Selenium Manager 处理"""
+        started_at = time.monotonic()
+        chrome_binary, chrome_version = detect_chrome()
+        manifest = self.load_manifest()
+
+        if (manifest and os.path.isfile(manifest.get('driver_path', ''))
+                and major_version(manifest.get('chrome_version')) == major_version(chrome_version)):
+            driver_path, source = manifest['driver_path'], 'cache'
+        elif self.offline:
+            driver_path, source = shutil.which('chromedriver'), 'path'
+            if not driver_path:
+                raise RuntimeError("离线模式下缓存中没有匹配的 chromedriver，PATH 中也找不到 chromedriver")
+        else:
+            try:
+                driver_path, source = self.download(), 'download'
+                self.save_manifest({
+                    'chrome_binary': chrome_binary,
+                    'chrome_version': chrome_version,
+                    'driver_path': driver_path,
+                    'resolved_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                })
+            except Exception as e:
+                logger.warning(f"下载 chromedriver 失败，交给 Selenium Manager 处理: {e}")
+                driver_path, source = None, 'selenium-manager'
+
+        elapsed = time.monotonic() - started_at
+        logger.info(f"chromedriver 解析完成（来源: {source}，Chrome {chrome_version or '未知'}），耗时 {elapsed:.2f} 秒")
+        return driver_path, source
+
+
+_resolved = None
+_resolved_lock = threading.Lock()
+
+
+def resolve_chromedriver():
+    """进程内只解析一次，并发创建的驱动共享结果"""
+    global _resolved
+    with _resolved_lock:
+        if _resolved is None:
+            _resolved = DriverResolver().resolve()
+        return _resolved[0]
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+启动浏览器前的站点健康预检
+变量名：PREFLIGHT_CHECK（设为 0 关闭预检）、PREFLIGHT_TIMEOUT（单次探测超时秒数，默认 5）
+        PREFLIGHT_CACHE_TTL（探测结果缓存秒数，默认 300，常驻的任务服务到期后重新探测）
+探测目标取自 LEAFLOW_LOGIN_URL / LEAFLOW_CHECKIN_URL / LEAFLOW_HOME_URL / WEIRDHOST_BASE_URL，指向替身站点时一并生效
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+
+def origins_of(*urls):
+    """返回 URL 的 scheme://host[:port]，去重并保持顺序"""
+    origins = []
+    for url in urls:
+        parts = urlparse(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        if parts.netloc and origin not in origins:
+            origins.append(origin)
+    return origins
+
+
+# 各流程依赖的目标站点（默认值与 leaflow_checkin.py / SuperApp.py 中的站点地址一致）
+LEAFLOW_HOSTS = origins_of(
+    os.getenv('LEAFLOW_LOGIN_URL', 'https://leaflow.net/login'),
+    os.getenv('LEAFLOW_CHECKIN_URL', 'https://checkin.leaflow.net'),
+    os.getenv('LEAFLOW_HOME_URL', 'https://leaflow.net/'),
+)
+WEIRDHOST_HOSTS = origins_of(os.getenv('WEIRDHOST_BASE_URL', 'https://hub.weirdhost.xyz'))
+
+
+class HostHealthChecker:
+    """用连接池复用的轻量 HTTP 请求探测主机，结果缓存 ttl 秒"""
+
+    def __init__(self, timeout=None, enabled=None, ttl=None):
+        self.timeout = timeout if timeout is not None else float(os.getenv('PREFLIGHT_TIMEOUT', '5'))
+        self.enabled = enabled if enabled is not None else os.getenv('PREFLIGHT_CHECK', '1') != '0'
+        self.ttl = ttl if ttl is not None else float(os.getenv('PREFLIGHT_CACHE_TTL', '300'))
+        self.results = {}
+        self.lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers['User-Agent'] = 'Mozilla/5.0 (preflight health check)'
+
+    def _probe(self, origin):
+        url = f"{origin}/"
+        try:
+            response = self.session.head(url, timeout=self.timeout, allow_redirects=False)
+            if response.status_code in (405, 501):
+                # 不支持 HEAD 的站点改用 GET，只读取响应头
+                response = self.session.get(url, timeout=self.timeout, allow_redirects=False, stream=True)
+                response.close()
+        except requests.exceptions.Timeout:
+            return False, f"连接超时（{self.timeout:g} 秒）"
+        except requests.exceptions.RequestException as e:
+            return False, f"无法连接: {e.__class__.__name__}"
+
+        # Cloudflare 质询模式对非浏览器客户端返回 403/503，真实浏览器通常可以通过
+        if response.headers.get('cf-mitigated') or (
+                response.status_code == 503 and 'cloudflare' in response.headers.get('server', '').lower()):
+            return True, f"Cloudflare 质询 (HTTP {response.status_code})"
+        # 其余任何非 5xx 响应都说明站点在线
+        if response.status_code >= 500:
+            return False, f"HTTP {response.status_code}"
+        return True, f"HTTP {response.status_code}"
+
+    def check(self, host):
+        """返回 (是否健康, 说明)，缓存有效期内同一主机只探测一次"""
+        if not self.enabled:
+            return True, "预检已关闭"
+
+        with self.lock:
+            cached = self.results.get(host)
+            if cached and time.monotonic() - cached[0] < self.ttl:
+                return cached[1]
+
+        result = self._probe(host)
+        with self.lock:
+            self.results[host] = (time.monotonic(), result)
+
+        if result[0]:
+            logger.info(f"预检 {host}: 正常 ({result[1]})")
+        else:
+            logger.warning(f"预检 {host}: 异常 ({result[1]})")
+        return result
+
+    def unhealthy_hosts(self, hosts):
+        """并发探测多个主机，返回异常主机的 [(主机, 说明)] 列表"""
+        with ThreadPoolExecutor(max_workers=max(1, len(hosts))) as executor:
+            results = list(executor.map(self.check, hosts))
+        return [(host, detail) for host, (healthy, detail) in zip(hosts, results) if not healthy]
+
+
+def format_host_failures(failures):
+    """把异常主机格式化为通知文本，每个主机一行"""
+    return ''.join(f"🌐 {host}: {detail}\n" for host, detail in failures)
+
+
+_checker = None
+_checker_lock = threading.Lock()
+
+
+def get_health_checker():
+    """返回进程内共享的健康检查器"""
+    global _checker
+    with _checker_lock:
+        if _checker is None:
+            _checker = HostHealthChecker()
+        return _checker
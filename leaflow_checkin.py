@@ -13,45 +13,128 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.action_chains import ActionChains
+from selenium.common.exceptions import TimeoutException
 import requests
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+from config import parse_colon_accounts
+from rate_limiter import get_rate_limiter
+from health_check import LEAFLOW_HOSTS, get_health_checker, format_host_failures
+from perf_metrics import get_perf_collector
+from proxy_pool import get_proxy_pool
+from driver_resolver import resolve_chromedriver
+from asset_cache import get_asset_cache
+from credential_quarantine import LoginCredentialError, get_quarantine, is_credential_error, mask_email
+from account_lease import LEASE_ACQUIRED, LEASE_DONE, get_account_leases, leaflow_lease_key
+from browser_farm import get_selenium_farm
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 站点地址，可指向本地替身站点做测试
+LEAFLOW_LOGIN_URL = os.getenv('LEAFLOW_LOGIN_URL', 'https://leaflow.net/login')
+LEAFLOW_CHECKIN_URL = os.getenv('LEAFLOW_CHECKIN_URL', 'https://checkin.leaflow.net')
+
+def create_driver(proxy=None, disk_cache_dir=None, remote_url=None):
+    """创建Chrome驱动，传入代理时所有流量经该代理出口，传入缓存目录时复用之前下载的静态资源
+    传入 remote_url 时在远程 Selenium 节点上创建会话"""
+    chrome_options = Options()
+    
+    # GitHub Actions环境配置
+    if os.getenv('GITHUB_ACTIONS'):
+        chrome_options.add_argument('--headless')
+        chrome_options.add_argument('--no-sandbox')
+        chrome_options.add_argument('--disable-dev-shm-usage')
+        chrome_options.add_argument('--disable-gpu')
+        chrome_options.add_argument('--window-size=1920,1080')
+    
+    # 通用配置
+    chrome_options.add_argument('--disable-blink-features=AutomationControlled')
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    chrome_options.add_experimental_option('useAutomationExtension', False)
+    
+    if proxy is not None:
+        chrome_options.add_argument(proxy.chrome_argument())
+    
+    if remote_url:
+        # 远程节点：本机的缓存目录和 chromedriver 都不适用
+        driver = webdriver.Remote(command_executor=remote_url, options=chrome_options)
+        driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        return driver
+    
+    # 磁盘缓存跨账号、跨运行共享；cookies 仍保存在每个实例独立的临时配置目录中
+    if disk_cache_dir:
+        chrome_options.add_argument(f'--disk-cache-dir={disk_cache_dir}')
+    
+    # 驱动路径首次解析后缓存，之后不再经 Selenium Manager 联网查找
+    service = Service(executable_path=resolve_chromedriver())
+    driver = webdriver.Chrome(service=service, options=chrome_options)
+    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    return driver
+
 class LeaflowAutoCheckin:
-    def __init__(self, email, password):
+    def __init__(self, email, password, driver=None, proxy=None):
         self.email = email
         self.password = password
+        self.proxy = proxy
         self.telegram_bot_token = os.getenv('TELEGRAM_BOT_TOKEN', '')
         self.telegram_chat_id = os.getenv('TELEGRAM_CHAT_ID', '')
         
         if not self.email or not self.password:
             raise ValueError("邮箱和密码不能为空")
         
-        self.driver = None
-        self.setup_driver()
+        # 传入已有驱动时复用它（服务模式的常驻浏览器），结束后只清理会话不退出
+        self.owns_driver = driver is None
+        self.driver = driver
+        self.disk_cache_dir = None
+        self.remote_node = None
+        if self.owns_driver:
+            self.setup_driver()
+        else:
+            self.reset_session()
     
-    def setup_driver(self):
+    def setup_driver(self, exclude_nodes=None):
         """设置Chrome驱动选项"""
-        chrome_options = Options()
-        
-        # GitHub Actions环境配置
-        if os.getenv('GITHUB_ACTIONS'):
-            chrome_options.add_argument('--headless')
-            chrome_options.add_argument('--no-sandbox')
-            chrome_options.add_argument('--disable-dev-shm-usage')
-            chrome_options.add_argument('--disable-gpu')
-            chrome_options.add_argument('--window-size=1920,1080')
+        # 配置了远程节点时由节点池选择空闲槽位最多的节点，连接失败时换节点重试
+        farm = get_selenium_farm()
+        if farm.enabled:
+            self.remote_node, self.driver = farm.open(
+                lambda node: create_driver(self.proxy, remote_url=node.url), exclude=exclude_nodes
+            )
+            logger.info(f"使用远程浏览器节点 {self.remote_node.url}")
+            return
+        self.disk_cache_dir = get_asset_cache().acquire_disk_cache_dir()
+        try:
+            self.driver = create_driver(self.proxy, self.disk_cache_dir)
+        except Exception:
+            get_asset_cache().release_disk_cache_dir(self.disk_cache_dir)
+            raise
+    
+    def reset_session(self):
+        """清除复用浏览器中上一个账号留下的 cookies 和站点存储"""
+        origins = []
+        for url in (LEAFLOW_LOGIN_URL, LEAFLOW_CHECKIN_URL):
+            parts = urlparse(url)
+            origins.append(f"{parts.scheme}://{parts.netloc}")
         
-        # 通用配置
-        chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-        chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        chrome_options.add_experimental_option('useAutomationExtension', False)
+        if hasattr(self.driver, 'execute_cdp_cmd'):
+            self.driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            for origin in origins:
+                self.driver.execute_cdp_cmd('Storage.clearDataForOrigin', {
+                    'origin': origin,
+                    'storageTypes': 'cookies,local_storage,indexeddb,service_workers'
+                })
+            return
         
-        self.driver = webdriver.Chrome(options=chrome_options)
-        self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        # webdriver.Remote 没有 CDP 接口：逐个站点打开后通过 WebDriver 协议清除
+        for origin in origins:
+            get_rate_limiter().acquire(origin)
+            self.driver.get(origin)
+            self.driver.delete_all_cookies()
+            self.driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
         
     def close_popup(self):
         """关闭初始弹窗 - 通过点击外部区域"""
@@ -91,9 +174,11 @@ class LeaflowAutoCheckin:
         """执行登录流程"""
         logger.info(f"开始登录流程")
         
-        # 访问登录页面
-        self.driver.get("https://leaflow.net/login")
+        # 访问登录页面（按主机限速，并发时所有账号共享同一令牌桶）
+        get_rate_limiter().acquire(LEAFLOW_LOGIN_URL)
+        self.driver.get(LEAFLOW_LOGIN_URL)
         time.sleep(5)  # 增加初始等待时间
+        get_perf_collector().record_selenium(self.driver, "leaflow_login")
         
         # 关闭弹窗
         self.close_popup()
@@ -138,7 +223,13 @@ class LeaflowAutoCheckin:
             logger.error(f"输入邮箱时出错: {e}")
             # 尝试使用JavaScript直接设置值
             try:
-                self.driver.execute_script(f"document.querySelector('input[type=\"text\"], input[type=\"email\"]').value = '{self.email}';")
+                # 触发 input 事件，否则前端框架拿不到值，表单会以空邮箱提交
+                self.driver.execute_script(
+                    "const input = document.querySelector('input[type=\"text\"], input[type=\"email\"]');"
+                    "input.value = arguments[0];"
+                    "input.dispatchEvent(new Event('input', {bubbles: true}));",
+                    self.email
+                )
                 logger.info("通过JavaScript设置邮箱")
                 time.sleep(2)
             except:
@@ -193,34 +284,37 @@ class LeaflowAutoCheckin:
         except Exception as e:
             raise Exception(f"点击登录按钮失败: {e}")
         
-        # 等待登录完成
-        try:
-            WebDriverWait(self.driver, 20).until(
-                lambda driver: "dashboard" in driver.current_url or "workspaces" in driver.current_url or "login" not in driver.current_url
-            )
-            
-            # 检查当前URL确认登录成功
-            current_url = self.driver.current_url
+        # 等待登录完成：URL 跳转即成功，等待期间出现错误提示则立即结束
+        def login_settled(driver):
+            current_url = driver.current_url
             if "dashboard" in current_url or "workspaces" in current_url or "login" not in current_url:
-                logger.info(f"登录成功，当前URL: {current_url}")
                 return True
-            else:
-                raise Exception("登录后未跳转到正确页面")
-                
+            error_text = self.find_login_error()
+            if error_text:
+                if is_credential_error(error_text):
+                    raise LoginCredentialError(error_text)
+                raise Exception(f"登录失败: {error_text}")
+            return False
+        
+        try:
+            WebDriverWait(self.driver, 20, poll_frequency=0.5).until(login_settled)
+            logger.info(f"登录成功，当前URL: {self.driver.current_url}")
+            return True
         except TimeoutException:
-            # 检查是否登录失败
+            raise Exception("登录超时，无法确认登录状态")
+    
+    def find_login_error(self):
+        """返回页面上可见的登录错误提示文本，没有则返回 None"""
+        error_selectors = [".error", ".alert-danger", "[class*='error']", "[class*='danger']"]
+        for selector in error_selectors:
             try:
-                error_selectors = [".error", ".alert-danger", "[class*='error']", "[class*='danger']"]
-                for selector in error_selectors:
-                    try:
-                        error_msg = self.driver.find_element(By.CSS_SELECTOR, selector)
-                        if error_msg.is_displayed():
-                            raise Exception(f"登录失败: {error_msg.text}")
-                    except:
-                        continue
-                raise Exception("登录超时，无法确认登录状态")
-            except Exception as e:
-                raise e
+                for element in self.driver.find_elements(By.CSS_SELECTOR, selector):
+                    text = element.text.strip()
+                    if text and element.is_displayed():
+                        return text
+            except Exception:
+                continue
+        return None
     
     def wait_for_checkin_page_loaded(self, max_retries=3, wait_time=20):
         """等待签到页面完全加载，支持重试"""
@@ -321,11 +415,12 @@ class LeaflowAutoCheckin:
         logger.info("跳转到签到页面...")
         
         # 跳转到签到页面
-        self.driver.get("https://checkin.leaflow.net")
+        self.driver.get(LEAFLOW_CHECKIN_URL)
         
         # 等待签到页面加载（最多重试3次，每次等待20秒）
         if not self.wait_for_checkin_page_loaded(max_retries=3, wait_time=20):
             raise Exception("签到页面加载失败，无法找到签到相关元素")
+        get_perf_collector().record_selenium(self.driver, "checkin_page")
         
         # 查找并点击立即签到按钮
         checkin_result = self.find_and_click_checkin_button()
@@ -397,28 +492,75 @@ class LeaflowAutoCheckin:
         except Exception as e:
             return f"获取签到结果时出错: {str(e)}"
     
+    def session_lost(self):
+        """远程节点上自己创建的会话是否已经断开"""
+        if self.remote_node is None or self.driver is None:
+            return False
+        try:
+            self.driver.title
+            return False
+        except Exception:
+            return True
+    
+    def quit_driver(self, success=True):
+        """退出自己创建的浏览器并归还远程节点；节点已断开时 quit() 的异常不影响签到结果"""
+        if self.driver is None or not self.owns_driver:
+            return
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.warning(f"关闭浏览器失败: {e}")
+        finally:
+            get_selenium_farm().release(self.remote_node, success=success)
+            self.driver = self.remote_node = None
+    
+    def login_and_checkin(self):
+        """登录并签到，返回 (True, 签到结果)"""
+        # 登录
+        if self.login():
+            # 签到
+            # 登录成功说明凭证有效，清除之前累计的密码错误次数
+            get_quarantine().clear(self.email)
+            result = self.checkin()
+            logger.info(f"签到结果: {result}")
+            return True, result
+        else:
+            raise Exception("登录失败")
+    
     def run(self):
-        """单个账号执行流程"""
+        """单个账号执行流程；远程节点上的会话中途断开时换一个节点重试一次"""
         try:
             logger.info(f"开始处理账号")
             
-            # 登录
-            if self.login():
-                # 签到
-                result = self.checkin()
-                logger.info(f"签到结果: {result}")
-                return True, result
-            else:
-                raise Exception("登录失败")
+            try:
+                return self.login_and_checkin()
+            except LoginCredentialError:
+                raise
+            except Exception as e:
+                if not self.session_lost():
+                    raise
+                # 签到流程会识别「已签到」，重试不会重复签到
+                failed_node = self.remote_node
+                logger.warning(f"远程浏览器节点 {failed_node.url} 上的会话已断开，换一个节点重试: {e}")
+                self.quit_driver(success=False)
+                self.setup_driver(exclude_nodes=[failed_node])
+                return self.login_and_checkin()
                 
+        except LoginCredentialError as e:
+            # 凭证被拒绝：记录指纹，连续多次后在凭证变更前不再尝试
+            get_quarantine().quarantine(self.email, self.password, str(e))
+            error_msg = f"登录凭证错误: {e}"
+            logger.error(error_msg)
+            return False, error_msg
+        
         except Exception as e:
             error_msg = f"自动签到失败: {str(e)}"
             logger.error(error_msg)
             return False, error_msg
         
         finally:
-            if self.driver:
-                self.driver.quit()
+            self.quit_driver(success=not self.session_lost())
+            get_asset_cache().release_disk_cache_dir(self.disk_cache_dir)
 
 class MultiAccountManager:
     """多账号管理器 - 简化配置版本"""
@@ -439,26 +581,15 @@ class MultiAccountManager:
         if accounts_str:
             try:
                 logger.info("尝试解析冒号分隔多账号配置")
-                account_pairs = [pair.strip() for pair in accounts_str.split(',')]
+                parsed_accounts, errors = parse_colon_accounts(accounts_str)
                 
-                logger.info(f"找到 {len(account_pairs)} 个账号")
-                
-                for i, pair in enumerate(account_pairs):
-                    if ':' in pair:
-                        email, password = pair.split(':', 1)
-                        email = email.strip()
-                        password = password.strip()
-                        
-                        if email and password:
-                            accounts.append({
-                                'email': email,
-                                'password': password
-                            })
-                            logger.info(f"成功添加第 {i+1} 个账号")
-                        else:
-                            logger.warning(f"账号对格式错误")
-                    else:
-                        logger.warning(f"账号对缺少冒号分隔符")
+                for error in errors:
+                    logger.warning(error)
+                for email, password in parsed_accounts:
+                    accounts.append({
+                        'email': email,
+                        'password': password
+                    })
                 
                 if accounts:
                     logger.info(f"从冒号分隔格式成功加载了 {len(accounts)} 个账号")
@@ -488,7 +619,7 @@ class MultiAccountManager:
         
         raise ValueError("未找到有效的账号配置")
     
-    def send_notification(self, results):
+    def send_notification(self, results, host_failures=None, quarantined=None, skipped=None):
         """发送汇总通知到Telegram"""
         if not self.telegram_bot_token or not self.telegram_chat_id:
             logger.info("Telegram配置未设置，跳过通知")
@@ -497,16 +628,30 @@ class MultiAccountManager:
         try:
             # 构建通知消息
             success_count = sum(1 for _, success, _ in results if success)
-            total_count = len(results)
+            total_count = len(self.accounts)
             
             message = f"🏆 Leaflow自动签到通知\n"
             message += f"📊 成功: {success_count}/{total_count}\n\n"
             
+            # 站点不可用时每个主机只报告一行，而不是每个账号各报一次失败
+            if host_failures:
+                message += f"⚠️ 站点不可用，已跳过全部账号:\n"
+                message += format_host_failures(host_failures)
+            
+            # 被隔离的账号只在汇总中列出一次
+            if quarantined:
+                message += f"🔒 凭证错误已隔离（修改密码、记录过期或手动解除后恢复）: "
+                message += ", ".join(mask_email(email) for email, _ in quarantined) + "\n\n"
+            
+            # 由其他进程处理的账号不重复签到
+            if skipped:
+                message += f"⏭️ 已由其他进程处理，跳过: "
+                message += ", ".join(f"{mask_email(email)}（{reason}）" for email, reason in skipped) + "\n\n"
+            
             for email, success, result in results:
                 status = "✅" if success else "❌"
                 # 隐藏邮箱部分字符以保护隐私
-                masked_email = email[:3] + "***" + email[email.find("@"):]
-                message += f"{status} {masked_email}: {result}\n"
+                message += f"{status} {mask_email(email)}: {result}\n"
             
             url = f"https://api.telegram.org/bot{self.telegram_bot_token}/sendMessage"
             data = {
@@ -515,6 +660,7 @@ class MultiAccountManager:
                 "parse_mode": "HTML"
             }
             
+            get_rate_limiter().acquire(url)
             response = requests.post(url, data=data, timeout=10)
             if response.status_code == 200:
                 logger.info("Telegram汇总通知发送成功")
@@ -524,37 +670,80 @@ class MultiAccountManager:
         except Exception as e:
             logger.error(f"发送Telegram通知时出错: {e}")
     
+    def run_account(self, index, account):
+        """处理单个账号，返回 (邮箱, 是否成功, 结果)；由其他进程处理的账号返回 None"""
+        logger.info(f"处理第 {index}/{len(self.accounts)} 个账号")
+        
+        # 取得跨进程租约后才启动浏览器，避免两个工作流同时签到同一账号
+        leases = get_account_leases()
+        lease_key = leaflow_lease_key(account['email'])
+        lease_state = leases.acquire(lease_key)
+        if lease_state != LEASE_ACQUIRED:
+            reason = "今日已签到" if lease_state == LEASE_DONE else "正在签到中"
+            logger.info(f"账号 {mask_email(account['email'])} 已由其他进程处理（{reason}），跳过")
+            self.skipped.append((account['email'], reason))
+            return None
+        
+        # 同一账号始终使用同一个出口代理
+        proxy_pool = get_proxy_pool()
+        proxy = proxy_pool.assign(account['email'], require_unauthenticated=True)
+        started_at = time.monotonic()
+        success = False
+        
+        try:
+            auto_checkin = LeaflowAutoCheckin(account['email'], account['password'], proxy=proxy)
+            success, result = auto_checkin.run()
+            return account['email'], success, result
+        except Exception as e:
+            error_msg = f"处理账号时发生异常: {str(e)}"
+            logger.error(error_msg)
+            return account['email'], False, error_msg
+        finally:
+            proxy_pool.report_result(proxy, success, time.monotonic() - started_at)
+            leases.release(lease_key, done=success)
+    
     def run_all(self):
         """运行所有账号的签到流程"""
-        logger.info(f"开始执行 {len(self.accounts)} 个账号的签到任务")
+        # 账号间不再固定等待，请求频率由按主机的令牌桶限速器控制
+        max_workers = max(1, int(os.getenv('LEAFLOW_MAX_WORKERS', '1')))
+        logger.info(f"开始执行 {len(self.accounts)} 个账号的签到任务，并发数: {max_workers}")
         
-        results = []
+        # 预检目标站点，站点不可用时不启动任何浏览器
+        host_failures = get_health_checker().unhealthy_hosts(LEAFLOW_HOSTS)
+        if host_failures:
+            logger.error(f"目标站点不可用，跳过全部 {len(self.accounts)} 个账号")
+            self.send_notification([], host_failures)
+            return False, []
         
-        for i, account in enumerate(self.accounts, 1):
-            logger.info(f"处理第 {i}/{len(self.accounts)} 个账号")
-            
-            try:
-                auto_checkin = LeaflowAutoCheckin(account['email'], account['password'])
-                success, result = auto_checkin.run()
-                results.append((account['email'], success, result))
-                
-                # 在账号之间添加间隔，避免请求过于频繁
-                if i < len(self.accounts):
-                    wait_time = 5
-                    logger.info(f"等待{wait_time}秒后处理下一个账号...")
-                    time.sleep(wait_time)
-                    
-            except Exception as e:
-                error_msg = f"处理账号时发生异常: {str(e)}"
-                logger.error(error_msg)
-                results.append((account['email'], False, error_msg))
+        # 跳过仍在使用被拒绝凭证的账号
+        quarantine = get_quarantine()
+        quarantined = []
+        runnable = []
+        for account in self.accounts:
+            reason = quarantine.is_quarantined(account['email'], account['password'])
+            if reason:
+                logger.warning(f"跳过已隔离账号 {mask_email(account['email'])}: {reason}")
+                quarantined.append((account['email'], reason))
+            else:
+                runnable.append(account)
+        
+        self.skipped = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = [result for result in executor.map(
+                self.run_account, range(1, len(runnable) + 1), runnable
+            ) if result is not None]
         
         # 发送汇总通知
-        self.send_notification(results)
+        self.send_notification(results, quarantined=quarantined, skipped=self.skipped)
+        get_perf_collector().write_report()
+        for line in get_proxy_pool().report():
+            logger.info(f"代理统计 {line}")
+        for line in get_selenium_farm().report():
+            logger.info(f"远程节点统计 {line}")
         
         # 返回总体结果
         success_count = sum(1 for _, success, _ in results if success)
-        return success_count == len(self.accounts), results
+        return success_count + len(self.skipped) == len(self.accounts), results
 
 def main():
     """主函数"""
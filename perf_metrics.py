@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+浏览器端页面性能采集（默认关闭）
+变量名：PERF_METRICS（设为 1 开启）、PERF_REPORT_FILE（报告路径，默认 perf_report.json）
+采集内容：Navigation Timing、资源数量与传输大小、CDP Performance.getMetrics
+每次写出报告后清空已记录的访问，常驻的任务服务中每次运行各自覆盖写出一份报告
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# 在页面或 iframe 内执行，返回导航计时和资源列表
+COLLECT_JS = """() => {
+    const nav = performance.getEntriesByType('navigation')[0];
+    const resources = performance.getEntriesByType('resource').map(r => ({
+        name: r.name,
+        type: r.initiatorType,
+        duration: r.duration,
+        transferSize: r.transferSize || 0,
+        encodedBodySize: r.encodedBodySize || 0
+    }));
+    return {url: location.href, navigation: nav ? nav.toJSON() : null, resources: resources};
+}"""
+
+# 只保留与调优等待时间相关的 CDP 指标
+CDP_METRIC_NAMES = (
+    'JSHeapUsedSize', 'JSHeapTotalSize', 'Nodes', 'LayoutCount', 'LayoutDuration',
+    'RecalcStyleDuration', 'ScriptDuration', 'TaskDuration',
+)
+
+
+class PerfCollector:
+    """记录每次页面访问的性能数据，运行结束时输出按开销排序的报告"""
+
+    def __init__(self, enabled=None, report_file=None):
+        self.enabled = enabled if enabled is not None else os.getenv('PERF_METRICS', '0') == '1'
+        self.report_file = report_file or os.getenv('PERF_REPORT_FILE', 'perf_report.json')
+        self.visits = []
+        self.lock = threading.Lock()
+
+    def record_selenium(self, driver, label):
+        """采集 Selenium 当前页面"""
+        if not self.enabled:
+            return
+        try:
+            data = driver.execute_script(f"return ({COLLECT_JS})();")
+            metrics = {}
+            try:
+                driver.execute_cdp_cmd('Performance.enable', {})
+                metrics = driver.execute_cdp_cmd('Performance.getMetrics', {}).get('metrics', [])
+            except Exception as e:
+                logger.debug(f"获取 CDP 性能指标失败: {e}")
+            self._add(label, data, metrics)
+        except Exception as e:
+            logger.warning(f"采集页面性能数据失败 [{label}]: {e}")
+
+    def record_playwright(self, page, label, frame=None):
+        """采集 Playwright 页面，传入 frame 时采集该 iframe 内的计时数据
+        先等待 load 事件，否则 loadEventEnd 为 0，页面会在报告中被排成开销最小"""
+        if not self.enabled:
+            return
+        try:
+            target = frame or page
+            try:
+                target.wait_for_load_state('load', timeout=15000)
+            except Exception as e:
+                logger.debug(f"等待页面 load 事件超时 [{label}]: {e}")
+            data = target.evaluate(COLLECT_JS)
+            metrics = {}
+            try:
+                cdp = page.context.new_cdp_session(page)
+                cdp.send('Performance.enable')
+                metrics = cdp.send('Performance.getMetrics').get('metrics', [])
+                cdp.detach()
+            except Exception as e:
+                logger.debug(f"获取 CDP 性能指标失败: {e}")
+            self._add(label, data, metrics)
+        except Exception as e:
+            logger.warning(f"采集页面性能数据失败 [{label}]: {e}")
+
+    def _add(self, label, data, metrics):
+        navigation = data.get('navigation') or {}
+        resources = data.get('resources') or []
+        visit = {
+            'label': label,
+            'url': data.get('url'),
+            'recorded_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'load_ms': round(navigation.get('loadEventEnd') or navigation.get('duration') or 0, 1),
+            'dom_content_loaded_ms': round(navigation.get('domContentLoadedEventEnd') or 0, 1),
+            'ttfb_ms': round(navigation.get('responseStart') or 0, 1),
+            'resource_count': len(resources),
+            'transfer_bytes': sum(r['transferSize'] for r in resources) + (navigation.get('transferSize') or 0),
+            'cdp': {m['name']: m['value'] for m in metrics if m.get('name') in CDP_METRIC_NAMES},
+            'resources': resources,
+        }
+        with self.lock:
+            self.visits.append(visit)
+
+    def build_report(self, visits=None):
+        """按页面加载耗时和资源开销排序"""
+        if visits is None:
+            with self.lock:
+                visits = list(self.visits)
+
+        resources = {}
+        for visit in visits:
+            for r in visit['resources']:
+                parts = urlsplit(r['name'])
+                key = f"{parts.scheme}://{parts.netloc}{parts.path}"
+                entry = resources.setdefault(key, {
+                    'url': key, 'type': r['type'], 'count': 0, 'transfer_bytes': 0, 'total_ms': 0.0,
+                })
+                entry['count'] += 1
+                entry['transfer_bytes'] += r['transferSize']
+                entry['total_ms'] += r['duration']
+
+        pages = [{k: v for k, v in visit.items() if k != 'resources'} for visit in visits]
+        return {
+            'pages': sorted(pages, key=lambda p: p['load_ms'], reverse=True),
+            'resources_by_bytes': sorted(resources.values(), key=lambda r: r['transfer_bytes'], reverse=True),
+            'resources_by_time': sorted(resources.values(), key=lambda r: r['total_ms'], reverse=True),
+        }
+
+    def write_report(self, top=10):
+        """写出 JSON 报告并在日志中打印开销最高的页面和资源，写出后清空已记录的访问"""
+        with self.lock:
+            visits, self.visits = self.visits, []
+        if not self.enabled or not visits:
+            return None
+
+        report = self.build_report(visits)
+        try:
+            # 多个 worker 线程可能同时写同一个报告文件
+            with _report_file_lock:
+                with open(self.report_file, 'w', encoding='utf-8') as f:
+                    json.dump(report, f, indent=2, ensure_ascii=False)
+        except Exception as e:
+            logger.error(f"写入性能报告失败: {e}")
+            return report
+
+        logger.info(f"性能报告已写入 '{self.report_file}'，共 {len(report['pages'])} 次页面访问")
+        for p in report['pages'][:top]:
+            logger.info(f"  {p['label']}: 加载 {p['load_ms']}ms, {p['resource_count']} 个资源, {p['transfer_bytes']} 字节")
+        for r in report['resources_by_bytes'][:top]:
+            logger.info(f"  {r['url']}: {r['count']} 次, {r['transfer_bytes']} 字节, {r['total_ms']:.0f}ms")
+        return report
+
+
+_collector = None
+_collector_lock = threading.Lock()
+_report_file_lock = threading.Lock()
+
+
+def get_perf_collector():
+    """返回进程内共享的性能采集器"""
+    global _collector
+    with _collector_lock:
+        if _collector is None:
+            _collector = PerfCollector()
+        return _collector
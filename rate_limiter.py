@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+按主机共享的令牌桶限速器
+变量名：RATE_LIMITS
+变量值：主机1=次数/秒数,主机2=次数/秒数  例如 leaflow.net=6/60,api.telegram.org=1/1
+"""
+
+import os
+import time
+import logging
+import threading
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# 默认限速：(时间窗口内允许的次数, 时间窗口秒数)
+DEFAULT_RATE_LIMITS = {
+    'leaflow.net': (6, 60),          # 每分钟最多 6 次登录
+    'hub.weirdhost.xyz': (10, 60),   # 每分钟最多 10 次面板访问
+    'api.telegram.org': (1, 1),      # 每秒最多 1 条消息
+}
+
+
+class TokenBucket:
+    """线程安全的令牌桶，容量即时间窗口内允许的突发次数"""
+
+    def __init__(self, capacity, period):
+        if capacity <= 0 or period <= 0:
+            raise ValueError("令牌桶容量和时间窗口必须大于0")
+        self.capacity = float(capacity)
+        self.rate = capacity / float(period)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, tokens=1):
+        """取走令牌，不足时阻塞等待，返回实际等待的秒数"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                wait_time = (tokens - self.tokens) / self.rate
+            time.sleep(wait_time)
+            waited += wait_time
+
+
+class HostRateLimiter:
+    """按主机分配令牌桶，子域名沿用父域名的规则（checkin.leaflow.net -> leaflow.net）"""
+
+    def __init__(self, limits=None):
+        self.limits = dict(DEFAULT_RATE_LIMITS if limits is None else limits)
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def _match_rule(self, host):
+        host = host.lower()
+        for rule in sorted(self.limits, key=len, reverse=True):
+            if host == rule or host.endswith('.' + rule):
+                return rule
+        return None
+
+    def acquire(self, url_or_host, tokens=1):
+        """按 URL 或主机名取令牌，未配置规则的主机不限速"""
+        host = urlparse(url_or_host).hostname if '://' in url_or_host else url_or_host
+        rule = self._match_rule(host or '')
+        if rule is None:
+            return 0.0
+
+        with self.lock:
+            bucket = self.buckets.get(rule)
+            if bucket is None:
+                bucket = self.buckets[rule] = TokenBucket(*self.limits[rule])
+
+        waited = bucket.acquire(tokens)
+        if waited > 0:
+            logger.info(f"{rule} 触发限速，已等待 {waited:.1f} 秒")
+        return waited
+
+
+def parse_rate_limits(limits_str):
+    """解析 RATE_LIMITS，格式：主机=次数/秒数，多个规则逗号分隔"""
+    limits = {}
+    for item in [part.strip() for part in limits_str.split(',') if part.strip()]:
+        try:
+            host, spec = item.split('=', 1)
+            count, period = spec.split('/', 1)
+            limits[host.strip().lower()] = (int(count), float(period))
+        except ValueError:
+            logger.warning(f"跳过格式错误的限速规则 '{item}'，请使用 '主机=次数/秒数' 格式")
+    return limits
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """返回进程内共享的限速器，RATE_LIMITS 中的规则覆盖默认值"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            limits = dict(DEFAULT_RATE_LIMITS)
+            limits.update(parse_rate_limits(os.getenv('RATE_LIMITS', '')))
+            _limiter = HostRateLimiter(limits)
+        return _limiter
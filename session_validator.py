@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+浏览器导航前的轻量会话校验：用一次带 cookie 的 HTTP 请求判断会话是否有效
+结论按 (URL, cookies) 缓存 ttl 秒（默认 300），常驻的任务服务到期后重新校验
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class SessionValidator:
+    """校验结果：True 有效，False 无效（被重定向到登录页或 401），None 无法判断（交给浏览器确认）"""
+
+    def __init__(self, timeout=10, ttl=300):
+        self.timeout = timeout
+        self.ttl = ttl
+        self.verdicts = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _fingerprint(url, cookies):
+        parts = [url] + sorted(f"{c['name']}={c['value']}" for c in cookies)
+        return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+    def _check(self, url, cookies, login_url_pattern, proxies):
+        session = requests.Session()
+        if proxies:
+            session.proxies.update(proxies)
+        hostname = urlparse(url).hostname
+        for cookie in cookies:
+            session.cookies.set(
+                cookie['name'], cookie['value'], domain=cookie.get('domain', hostname), path=cookie.get('path', '/')
+            )
+        try:
+            response = session.get(url, timeout=self.timeout, allow_redirects=False)
+        except requests.exceptions.RequestException as e:
+            logger.info(f"会话校验请求失败，交给浏览器确认: {e.__class__.__name__}")
+            return None
+        finally:
+            session.close()
+
+        if response.is_redirect:
+            location = response.headers.get('Location', '')
+            return False if login_url_pattern in location else None
+        if response.status_code == 200:
+            return True
+        if response.status_code == 401:
+            return False
+        # 403 等可能是 Cloudflare 质询，无法判断
+        return None
+
+    def validate(self, url, cookies, login_url_pattern='login', proxies=None):
+        key = self._fingerprint(url, cookies)
+        with self.lock:
+            cached = self.verdicts.get(key)
+            if cached and time.monotonic() - cached[0] < self.ttl:
+                return cached[1]
+        verdict = self._check(url, cookies, login_url_pattern, proxies)
+        with self.lock:
+            # 顺带清理过期的结论，避免常驻进程中无限增长
+            now = time.monotonic()
+            self.verdicts = {k: v for k, v in self.verdicts.items() if now - v[0] < self.ttl}
+            self.verdicts[key] = (now, verdict)
+        return verdict
+
+
+_validator = None
+_validator_lock = threading.Lock()
+
+
+def get_session_validator():
+    """返回进程内共享的会话校验器"""
+    global _validator
+    with _validator_lock:
+        if _validator is None:
+            _validator = SessionValidator()
+        return _validator
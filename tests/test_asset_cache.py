@@ -0,0 +1,29 @@
+import pytest
+
+from asset_cache import AssetCache
+
+
+class FakeContext:
+    def __init__(self):
+        self.routes = []
+
+    def route(self, url, handler):
+        self.routes.append(url)
+
+
+@pytest.mark.parametrize('url, routed', [
+    ('https://leaflow.net/app.js', True),
+    ('https://static.leaflow.net/app.css', True),
+    ('http://hub.weirdhost.xyz:8080/logo.png', True),
+    ('https://example.com/leaflow.net/app.js', False),
+    ('https://leaflow.net.example.com/app.js', False),
+    ('https://notleaflow.net/app.js', False),
+])
+def test_attach_routes_only_cacheable_hosts(tmp_path, url, routed):
+    cache = AssetCache(cache_dir=str(tmp_path), hosts=['leaflow.net', 'hub.weirdhost.xyz'], enabled=True)
+    context = FakeContext()
+    cache.attach(context)
+
+    assert len(context.routes) == 1
+    assert bool(context.routes[0].search(url)) == routed
+
@@ -0,0 +1,228 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import checkin_service
+from checkin_service import CheckinService, JobStore, Worker, make_handler, validate_job_request
+
+LEAFLOW_PAYLOAD = {'email': 'user@example.com', 'password': 'secret'}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / 'jobs.db'))
+
+
+def test_claim_respects_tenant_limit(store):
+    first = store.submit('t1', 'leaflow', LEAFLOW_PAYLOAD)
+    second = store.submit('t1', 'leaflow', LEAFLOW_PAYLOAD)
+    other = store.submit('t2', 'leaflow', LEAFLOW_PAYLOAD)
+
+    assert store.claim(lambda tenant: 1)['id'] == first
+    # t1 已达到并发上限，跳过它排队中的任务
+    assert store.claim(lambda tenant: 1)['id'] == other
+    assert store.claim(lambda tenant: 1) is None
+
+    store.finish(first, True, {'message': 'ok'})
+    assert store.claim(lambda tenant: 1)['id'] == second
+
+
+def test_claim_uses_per_tenant_limits(store):
+    jobs = [store.submit('big', 'leaflow', LEAFLOW_PAYLOAD) for _ in range(3)]
+    limits = {'big': 2}
+
+    claimed = [store.claim(lambda tenant: limits.get(tenant, 1)) for _ in range(3)]
+    assert [job['id'] for job in claimed[:2]] == jobs[:2]
+    assert claimed[2] is None
+
+
+def test_running_jobs_are_requeued_after_restart(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    job_id = JobStore(db_path).submit('t1', 'leaflow', LEAFLOW_PAYLOAD)
+    assert JobStore(db_path).claim(lambda tenant: 1)['id'] == job_id
+
+    restarted = JobStore(db_path)
+    assert restarted.get(job_id)['status'] == 'queued'
+    job = restarted.claim(lambda tenant: 1)
+    assert job['id'] == job_id
+    assert json.loads(job['payload']) == LEAFLOW_PAYLOAD
+
+
+def test_finish_clears_credentials(store):
+    job_id = store.submit('t1', 'leaflow', LEAFLOW_PAYLOAD)
+    store.claim(lambda tenant: 1)
+    store.finish(job_id, False, error='boom')
+
+    row = store.conn.execute("SELECT payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    assert row['payload'] == '{}'
+    assert store.get(job_id)['status'] == 'failed'
+
+
+def test_validate_job_request_accepts_valid_jobs():
+    assert validate_job_request({'tenant': ' t1 ', 'kind': 'leaflow', 'payload': LEAFLOW_PAYLOAD}) == (
+        't1', 'leaflow', LEAFLOW_PAYLOAD
+    )
+    payload = {'env': {'LEAFLOW_ACCOUNTS': 'a@example.com:pw'}}
+    assert validate_job_request({'tenant': 't1', 'kind': 'superapp', 'payload': payload})[2] == payload
+
+
+@pytest.mark.parametrize('body', [
+    [],
+    {'kind': 'leaflow', 'payload': LEAFLOW_PAYLOAD},
+    {'tenant': 't1', 'kind': 'unknown', 'payload': {}},
+    {'tenant': 't1', 'kind': 'leaflow', 'payload': 'x'},
+    {'tenant': 't1', 'kind': 'leaflow', 'payload': {'email': 'user@example.com'}},
+    {'tenant': 't1', 'kind': 'superapp', 'payload': {}},
+])
+def test_validate_job_request_rejects_invalid_jobs(body):
+    with pytest.raises(ValueError):
+        validate_job_request(body)
+
+
+class FakeWorker:
+    """代替浏览器 worker：取出一个任务并直接写入结果"""
+
+    def __init__(self, service):
+        self.service = service
+
+    def run_once(self, success=True):
+        job = self.service.store.claim(self.service.tenant_limit)
+        self.service.store.finish(job['id'], success, {'message': 'done'})
+        return job['id']
+
+
+@pytest.fixture
+def api(tmp_path):
+    service = CheckinService(str(tmp_path / 'jobs.db'), workers=0, token='token')
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(service))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def call(method, path, body=None, token='token'):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(base_url + path, data=data, method=method)
+        if token:
+            request.add_header('Authorization', f"Bearer {token}")
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    yield service, call
+    server.shutdown()
+    server.server_close()
+
+
+def test_api_job_lifecycle(api):
+    service, call = api
+    status, body = call('POST', '/jobs', {'tenant': 't1', 'kind': 'leaflow', 'payload': LEAFLOW_PAYLOAD})
+    assert status == 202
+    job_id = body['id']
+
+    status, body = call('GET', f'/jobs/{job_id}/result')
+    assert status == 409
+    assert body['status'] == 'queued'
+
+    FakeWorker(service).run_once()
+
+    status, body = call('GET', f'/jobs/{job_id}/result')
+    assert status == 200
+    assert body['status'] == 'succeeded'
+    assert body['result'] == {'message': 'done'}
+
+    status, body = call('GET', '/jobs?tenant=t1')
+    assert status == 200
+    assert [job['id'] for job in body['jobs']] == [job_id]
+    assert 'payload' not in body['jobs'][0]
+
+
+def test_api_rejects_bad_requests(api):
+    service, call = api
+    assert call('POST', '/jobs', {'tenant': 't1', 'kind': 'leaflow', 'payload': {}})[0] == 400
+    assert call('POST', '/jobs', {'tenant': 't1'}, token='wrong')[0] == 401
+    assert call('GET', '/jobs', token=None)[0] == 401
+    assert call('GET', '/jobs/missing')[0] == 404
+    assert call('GET', '/jobs/missing/result')[0] == 404
+    assert call('POST', '/other', {})[0] == 404
+    assert service.store.counts() == {}
+
+
+class FakeBrowser:
+    def __init__(self, connected):
+        self.connected = connected
+        self.closed = False
+
+    def is_connected(self):
+        return self.connected
+
+    def close(self):
+        self.closed = True
+
+
+class FakePlaywrightManager:
+    def __exit__(self, *args):
+        pass
+
+
+def test_failed_superapp_job_discards_disconnected_browser(tmp_path, monkeypatch):
+    import SuperApp
+
+    service = CheckinService(str(tmp_path / 'jobs.db'), workers=0)
+    worker = Worker(service, 1)
+    browser = FakeBrowser(connected=True)
+    worker.browser, worker.playwright_manager, worker.playwright = browser, FakePlaywrightManager(), object()
+
+    def run(playwright, browser=None, env=None):
+        # 任务执行过程中浏览器断开，SuperApp 按单个账户失败处理并正常返回
+        browser.connected = False
+        return {'notifications': [], 'outcomes': {'leaflow': False}}
+
+    monkeypatch.setattr(SuperApp, 'run', run)
+    success, result = worker.run_superapp({'env': {}})
+
+    assert not success
+    assert browser.closed
+    assert worker.browser is None
+
+
+def test_superapp_job_replaces_disconnected_browser(tmp_path, monkeypatch):
+    import SuperApp
+
+    service = CheckinService(str(tmp_path / 'jobs.db'), workers=0)
+    worker = Worker(service, 1)
+    dead_browser = FakeBrowser(connected=False)
+    worker.browser, worker.playwright_manager, worker.playwright = dead_browser, FakePlaywrightManager(), object()
+
+    new_browser = FakeBrowser(connected=True)
+
+    class FakeChromium:
+        def launch(self, headless=True):
+            return new_browser
+
+    class FakePlaywright:
+        chromium = FakeChromium()
+
+    class FakeSyncPlaywright(FakePlaywrightManager):
+        def start(self):
+            return FakePlaywright()
+
+    used = []
+
+    def run(playwright, browser=None, env=None):
+        used.append(browser)
+        return {'notifications': [], 'outcomes': {'leaflow': True}}
+
+    monkeypatch.setattr(SuperApp, 'run', run)
+    monkeypatch.setattr('playwright.sync_api.sync_playwright', FakeSyncPlaywright)
+    monkeypatch.setattr(checkin_service.get_playwright_farm(), 'nodes', [])
+    success, _ = worker.run_superapp({'env': {}})
+
+    assert success
+    assert dead_browser.closed
+    assert used == [new_browser]
@@ -0,0 +1,36 @@
+import pytest
+
+from credential_quarantine import CredentialQuarantine, is_credential_error
+
+
+@pytest.mark.parametrize('message', [
+    "Invalid credentials, please try again.",
+    "Incorrect password. Please try again",
+    "账号或密码错误，请稍后重试",
+    "请输入正确的邮箱或密码",
+])
+def test_wrong_password_messages_count(message):
+    assert is_credential_error(message)
+
+
+@pytest.mark.parametrize('message', [
+    "登录过于频繁，请稍后再试",
+    "Too many attempts, invalid credentials",
+    "验证码错误",
+    "网络错误，请稍后重试",
+])
+def test_rate_limit_and_other_messages_do_not_count(message):
+    assert not is_credential_error(message)
+
+
+def test_quarantine_after_threshold_until_password_changes(tmp_path):
+    path = str(tmp_path / 'quarantine.json')
+    quarantine = CredentialQuarantine(path, threshold=2, days=7)
+
+    quarantine.quarantine('user@example.com', 'old', '密码错误')
+    assert quarantine.is_quarantined('user@example.com', 'old') is None
+    quarantine.quarantine('user@example.com', 'old', '密码错误')
+    assert CredentialQuarantine(path, threshold=2, days=7).is_quarantined('user@example.com', 'old') == '密码错误'
+
+    assert quarantine.is_quarantined('user@example.com', 'new') is None
+    assert quarantine.clear() == 0
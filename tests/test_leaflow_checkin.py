@@ -0,0 +1,66 @@
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+import leaflow_checkin
+from browser_farm import BrowserFarm, BrowserNode
+
+
+class FakeDriver:
+    def __init__(self, node_url, quit_error=False):
+        self.node_url = node_url
+        self.dead = False
+        self.quit_error = quit_error
+
+    @property
+    def title(self):
+        if self.dead:
+            raise WebDriverException("session deleted")
+        return "Leaflow"
+
+    def quit(self):
+        if self.dead or self.quit_error:
+            raise WebDriverException("node unreachable")
+
+
+@pytest.fixture
+def farm(monkeypatch):
+    farm = BrowserFarm([BrowserNode('http://node-1:4444', 1), BrowserNode('http://node-2:4444', 1)], attempts=3)
+    monkeypatch.setattr(leaflow_checkin, 'get_selenium_farm', lambda: farm)
+    return farm
+
+
+def test_account_is_retried_on_another_node_when_session_dies(farm, monkeypatch):
+    drivers = []
+
+    def create_driver(proxy=None, disk_cache_dir=None, remote_url=None):
+        drivers.append(FakeDriver(remote_url))
+        return drivers[-1]
+
+    def login_and_checkin(self):
+        if len(drivers) == 1:
+            self.driver.dead = True
+            raise WebDriverException("session deleted")
+        return True, "签到成功"
+
+    monkeypatch.setattr(leaflow_checkin, 'create_driver', create_driver)
+    monkeypatch.setattr(leaflow_checkin.LeaflowAutoCheckin, 'login_and_checkin', login_and_checkin)
+
+    result = leaflow_checkin.LeaflowAutoCheckin('user@example.com', 'secret').run()
+
+    assert result == (True, "签到成功")
+    assert drivers[0].node_url != drivers[1].node_url
+    nodes = {node.url: node for node in farm.nodes}
+    assert nodes[drivers[0].node_url].errors == 1
+    assert nodes[drivers[1].node_url].errors == 0
+    assert all(node.in_use == 0 for node in farm.nodes)
+
+
+def test_quit_error_does_not_change_result(farm, monkeypatch):
+    monkeypatch.setattr(
+        leaflow_checkin, 'create_driver',
+        lambda proxy=None, disk_cache_dir=None, remote_url=None: FakeDriver(remote_url, quit_error=True)
+    )
+    monkeypatch.setattr(leaflow_checkin.LeaflowAutoCheckin, 'login_and_checkin', lambda self: (True, "签到成功"))
+
+    assert leaflow_checkin.LeaflowAutoCheckin('user@example.com', 'secret').run() == (True, "签到成功")
+    assert all(node.in_use == 0 and node.errors == 0 for node in farm.nodes)
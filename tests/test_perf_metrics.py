@@ -0,0 +1,26 @@
+import json
+
+from perf_metrics import PerfCollector
+
+PAGE = {
+    'url': 'https://leaflow.net/',
+    'navigation': {'loadEventEnd': 120.0, 'domContentLoadedEventEnd': 80.0, 'responseStart': 20.0},
+    'resources': [{'name': 'https://leaflow.net/app.js', 'type': 'script', 'duration': 30.0,
+                   'transferSize': 1000, 'encodedBodySize': 900}],
+}
+
+
+def test_write_report_clears_recorded_visits(tmp_path):
+    report_file = tmp_path / 'perf_report.json'
+    collector = PerfCollector(enabled=True, report_file=str(report_file))
+
+    collector._add('leaflow_home', PAGE, [])
+    collector._add('checkin_page', PAGE, [])
+    assert len(collector.write_report()['pages']) == 2
+    assert collector.visits == []
+    assert collector.write_report() is None
+
+    collector._add('leaflow_home', PAGE, [])
+    report = collector.write_report()
+    assert [page['label'] for page in report['pages']] == ['leaflow_home']
+    assert json.loads(report_file.read_text(encoding='utf-8'))['pages'][0]['load_ms'] == 120.0
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Weirdhost 无浏览器续期：用 remember_web_* cookie 直接调用面板接口
+变量名：WEIRDHOST_HTTP_RENEWAL（设为 0 时始终使用浏览器）
+        WEIRDHOST_RENEW_PATH（续期接口路径模板，默认 /api/client/notfreeservers/{server_id}/renew）
+        WEIRDHOST_RENEW_TIMEOUT（续期后等待到期时间更新的最长秒数，浏览器流程共用，默认 30）
+失败时由 SuperApp.py 回退到 Playwright 流程
+"""
+
+import os
+import re
+import time
+import logging
+from datetime import datetime
+from urllib.parse import urlparse, unquote
+
+import pytz
+import requests
+
+logger = logging.getLogger(__name__)
+
+REMEMBER_COOKIE_NAME = 'remember_web_59ba36addc2b2f9401580f014c7f58ea4e30989d'
+KST = pytz.timezone('Asia/Seoul')
+
+DATE_PATTERN = re.compile(r"(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2})(?::\d{2}(?:\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?")
+# 面板页面上的到期时间文本（与浏览器流程中定位的元素相同）
+EXPIRATION_TEXT_PATTERN = re.compile(r"유통기한\s(\d{4}-\d{2}-\d{2}\s\d{2}:\d{2})")
+
+
+class WeirdhostHttpError(Exception):
+    """HTTP 续期流程无法完成，需要回退到浏览器"""
+
+
+def parse_panel_datetime(text):
+    """把面板返回的日期字符串转为 KST 时间，不带时区的值按 KST 处理"""
+    match = DATE_PATTERN.search(text)
+    if not match:
+        return None
+    date_part, time_part, offset = match.groups()
+    naive_dt = datetime.strptime(f"{date_part} {time_part}", "%Y-%m-%d %H:%M")
+    if not offset:
+        return KST.localize(naive_dt)
+    if offset == 'Z':
+        return pytz.utc.localize(naive_dt).astimezone(KST)
+    offset = offset.replace(':', '')
+    aware_dt = datetime.strptime(f"{date_part} {time_part} {offset}", "%Y-%m-%d %H:%M %z")
+    return aware_dt.astimezone(KST)
+
+
+def find_expiration_value(data):
+    """在接口 JSON 中查找到期时间字段（键名包含 expir/renew/end），返回原始字符串"""
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if isinstance(value, str) and re.search(r"expir|renew|end", key, re.I) and DATE_PATTERN.search(value):
+                return value
+        for value in data.values():
+            found = find_expiration_value(value)
+            if found:
+                return found
+    elif isinstance(data, list):
+        for value in data:
+            found = find_expiration_value(value)
+            if found:
+                return found
+    return None
+
+
+class WeirdhostHttpClient:
+    """用 requests.Session 读取服务器到期时间并执行续期"""
+
+    def __init__(self, server_url, remember_cookie='', cookies=None, timeout=15):
+        parts = urlparse(server_url)
+        match = re.search(r"/server/([^/?#]+)", parts.path)
+        if not match:
+            raise WeirdhostHttpError(f"无法从 WEIRDHOST_LOGIN_URL 解析服务器 ID: {server_url}")
+        self.server_url = server_url
+        self.base_url = f"{parts.scheme}://{parts.netloc}"
+        self.server_id = match.group(1)
+        self.timeout = timeout
+        self.renew_path = os.getenv('WEIRDHOST_RENEW_PATH', '/api/client/notfreeservers/{server_id}/renew')
+
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = (
+            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+            'Chrome/120.0 Safari/537.36'
+        )
+        for cookie in cookies or []:
+            self.session.cookies.set(
+                cookie['name'], cookie['value'], domain=cookie.get('domain', parts.hostname), path=cookie.get('path', '/')
+            )
+        if remember_cookie:
+            self.session.cookies.set(REMEMBER_COOKIE_NAME, remember_cookie, domain=parts.hostname, path='/')
+
+    def _api_headers(self):
+        headers = {
+            'Accept': 'application/json',
+            'X-Requested-With': 'XMLHttpRequest',
+            'Referer': self.server_url,
+        }
+        xsrf_token = self.session.cookies.get('XSRF-TOKEN')
+        if xsrf_token:
+            headers['X-XSRF-TOKEN'] = unquote(xsrf_token)
+        return headers
+
+    def open_session(self):
+        """访问服务器页面，确认会话有效并取得 XSRF-TOKEN"""
+        response = self.session.get(self.server_url, timeout=self.timeout, allow_redirects=False)
+        location = response.headers.get('Location', '')
+        if response.is_redirect and 'login' in location:
+            raise WeirdhostHttpError("Cookie 已失效，被重定向到登录页")
+        if response.status_code != 200:
+            raise WeirdhostHttpError(f"访问服务器页面失败: HTTP {response.status_code}")
+        return response.text
+
+    def get_expiration(self, page_html=None):
+        """读取到期时间（KST），优先使用客户端接口，其次解析页面文本"""
+        response = self.session.get(
+            f"{self.base_url}/api/client/servers/{self.server_id}", headers=self._api_headers(), timeout=self.timeout
+        )
+        if response.status_code == 200:
+            try:
+                value = find_expiration_value(response.json())
+            except ValueError:
+                value = None
+            if value:
+                return parse_panel_datetime(value)
+
+        match = EXPIRATION_TEXT_PATTERN.search(page_html or '')
+        if match:
+            return parse_panel_datetime(match.group(1))
+        raise WeirdhostHttpError("接口和页面中都没有找到到期时间")
+
+    def renew(self):
+        """调用续期接口，非 2xx 响应视为失败"""
+        url = self.base_url + self.renew_path.format(server_id=self.server_id)
+        response = self.session.post(url, headers=self._api_headers(), timeout=self.timeout)
+        if not 200 <= response.status_code < 300:
+            raise WeirdhostHttpError(f"续期接口返回 HTTP {response.status_code}: {response.text[:200]}")
+        return response
+
+    def wait_for_expiration_change(self, old_expiration, timeout, interval=5):
+        """轮询到期时间直到与续期前不同并返回新值，超过 timeout 秒仍未变化时返回 None"""
+        started_at = time.monotonic()
+        while True:
+            try:
+                expiration = self.get_expiration(self.open_session())
+                if expiration != old_expiration:
+                    return expiration
+            except (WeirdhostHttpError, requests.exceptions.RequestException) as e:
+                logger.info(f"续期后读取到期时间失败，继续等待: {e}")
+            if time.monotonic() - started_at + interval > timeout:
+                return None
+            time.sleep(interval)